@@ -0,0 +1,239 @@
+"""
+簡易的 Prometheus 指標：Counter / Gauge / Histogram 與 /metrics 文字格式輸出。
+
+指標存在 process 內，每個 gunicorn worker 各自計數。記錄一次只是一個 dict 查詢加上
+一把鎖，熱路徑上可以放心使用；也可以給 function 參數，在抓取時才從既有的 stats()
+讀值，不必在熱路徑上重複計數。
+"""
+import bisect
+import ipaddress
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from . import profiling
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# 預設的秒數分桶，涵蓋 mmap 查詢（微秒級）到 CSV 掃描（數秒）
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指標名稱重複: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def reset(self):
+        """清掉所有計數（fork 出來的 worker 不沿用 master 的值）"""
+        for metric in list(self._metrics.values()):
+            with metric._lock:
+                metric._values.clear()
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), function=None, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # function() 回傳數值，或 {label 值 tuple: 數值}，抓取時才呼叫
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要的 labels: {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        if self.function is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.function()
+        if isinstance(value, dict):
+            return {tuple(str(v) for v in key): number for key, number in value.items()}
+        return {(): value} if value is not None else {}
+
+    def value(self, **labels):
+        return self._samples().get(self._key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        try:
+            samples = self._samples()
+        except Exception:
+            # 抓取時讀值失敗不影響其他指標
+            samples = {}
+        for key, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry=registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 每個分桶各自的次數，輸出時再累加成 Prometheus 的 le 形式
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+        # 正在 profiling 的請求同時記下這個階段的耗時
+        if profiling.is_active():
+            profiling.record_stage(f"{self.name}{_format_labels(self.labelnames, key)}", value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def value(self, **labels):
+        state = self._samples().get(self._key(labels))
+        return {'count': state[2], 'sum': state[1]} if state else {'count': 0, 'sum': 0.0}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            samples = {key: (list(state[0]), state[1], state[2]) for key, state in self._values.items()}
+        for key, (counts, total, count) in sorted(samples.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'aifinances_http_request_duration_seconds',
+    'API 請求從進入 Django 到回應的時間',
+    ['view', 'method', 'status'],
+)
+
+
+class MetricsMiddleware:
+    """記錄每個請求的端到端延遲，依 URL 名稱分組（不用實際路徑避免 label 爆量）"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, started)
+        return response
+
+    def _observe(self, request, response, started):
+        match = getattr(request, 'resolver_match', None)
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            view=match.view_name if match is not None else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+
+
+def _client_allowed(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in allowed)
+
+
+def metrics_view(request):
+    """Prometheus 抓取用的 /metrics，只開放給本機（METRICS_ALLOWED_IPS）"""
+    if not getattr(settings, 'METRICS_ENABLED', True) or not _client_allowed(request):
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,44 @@
+"""
+每個 worker process 各自一個的 ProcessPoolExecutor（預測工作、密碼雜湊共用這套邏輯）。
+
+- 第一次使用時才建立，大小在建立當下從 settings 讀取
+- 子 process 被 OOM killer 等原因中止（BrokenProcessPool）後換掉，下次重新建立
+- gunicorn preload 時 master 建立的 pool 不能在 worker 使用，fork 後由 after_fork 清掉
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = []
+
+
+class WorkerProcessPool:
+    def __init__(self, max_workers):
+        # max_workers 是回傳大小的函式，settings 在建立 pool 時才讀
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self.executor = None
+        _pools.append(self)
+
+    def get(self):
+        if self.executor is None:
+            with self._lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self._max_workers())
+        return self.executor
+
+    def reset(self, broken):
+        """broken 已經無法使用，換掉它讓下一次 get() 重新建立"""
+        with self._lock:
+            if self.executor is broken:
+                self.executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def forget(self):
+        # fork 後的子 process：master 的 pool 與鎖都不能沿用
+        self._lock = threading.Lock()
+        self.executor = None
+
+
+def after_fork():
+    for pool in _pools:
+        pool.forget()
@@ -0,0 +1,246 @@
+"""
+請求層級的 profiling：依取樣率或 header 觸發，對單一請求跑 cProfile（或 pyinstrument），
+把結果寫到 PROFILING_DIR，並附上 endpoint 與各階段耗時的 JSON。
+
+.prof 是標準 pstats 格式，可以直接用 snakeviz、flameprof 或 speedscope 轉成火焰圖。
+各階段耗時來自 metrics 的 Histogram（特徵查詢、模型預測、finlab 下載……），
+再加上這個請求期間的 GC 時間與 DRF 輸出（render）的時間。
+"""
+import cProfile
+import gc
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 目前請求的階段耗時 {階段: [次數, 秒數]}，沒有在 profiling 時為 None
+_stages = ContextVar('profiling_stages', default=None)
+# cProfile 同時只能有一個在跑，其他請求這時就不取樣
+_profiler_lock = threading.Lock()
+
+
+def is_active():
+    return _stages.get() is not None
+
+
+def record_stage(name, seconds):
+    """記錄一個階段的耗時；目前請求沒有在 profiling 時什麼都不做"""
+    stages = _stages.get()
+    if stages is None:
+        return
+    entry = stages.setdefault(name, [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+
+
+def get_profiling_dir():
+    return getattr(
+        settings,
+        'PROFILING_DIR',
+        os.path.join(tempfile.gettempdir(), 'aifinances', 'profiles'),
+    )
+
+
+class _GCTimer:
+    """用 gc.callbacks 累計 GC 的時間（整個 process 的 GC，只在 profiling 期間掛上）"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.collections = 0
+        self._started = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            self.seconds += time.perf_counter() - self._started
+            self.collections += 1
+            self._started = None
+
+
+class _Profiler:
+    def __init__(self, backend):
+        self.backend = backend
+        if backend == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if self.backend == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self.backend == 'pyinstrument':
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def dump(self, path):
+        if self.backend == 'pyinstrument':
+            path += '.html'
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+        else:
+            path += '.prof'
+            self._profiler.dump_stats(path)
+        return path
+
+
+class ProfilingMiddleware:
+    """取樣部分請求做 profiling，預設關閉（PROFILING_ENABLED）
+
+    - PROFILING_SAMPLE_RATE：每個請求被取樣的機率
+    - PROFILING_TOKEN：設定後，帶 X-Profile: <token> 的請求一定會被 profile
+    - PROFILING_PATHS：只 profile 這些路徑開頭的請求
+
+    profiler 只記錄呼叫它的執行緒，所以被 profile 的預測請求不使用 StockPredictor
+    的執行緒池，每一天的讀取與預測改在請求的執行緒依序執行（耗時會比平常長）。
+    ASGI 模式下 profiler 掛在 event loop 的執行緒上，同時間其他請求的協程也會被記到。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _should_profile(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            return False
+        paths = getattr(settings, 'PROFILING_PATHS', ['/prediction/', '/stocks/'])
+        if not any(request.path.startswith(prefix) for prefix in paths):
+            return False
+        token = getattr(settings, 'PROFILING_TOKEN', '')
+        if token and request.headers.get('X-Profile') == token:
+            return True
+        return random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._should_profile(request) or not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            session = self._start()
+            try:
+                response = self.get_response(request)
+            finally:
+                self._stop(session)
+            self._finish(request, response, session)
+            return response
+        finally:
+            _profiler_lock.release()
+
+    async def __acall__(self, request):
+        if not self._should_profile(request) or not _profiler_lock.acquire(blocking=False):
+            return await self.get_response(request)
+
+        try:
+            session = self._start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                self._stop(session)
+            self._finish(request, response, session)
+            return response
+        finally:
+            _profiler_lock.release()
+
+    def _start(self):
+        stages = {}
+        gc_timer = _GCTimer()
+        gc.callbacks.append(gc_timer)
+        profiler = _Profiler(getattr(settings, 'PROFILING_BACKEND', 'cprofile'))
+        session = {
+            'stages': stages,
+            'token': _stages.set(stages),
+            'gc_timer': gc_timer,
+            'profiler': profiler,
+            'started': time.perf_counter(),
+        }
+        profiler.start()
+        return session
+
+    def _stop(self, session):
+        session['profiler'].stop()
+        session['duration'] = time.perf_counter() - session['started']
+        gc.callbacks.remove(session['gc_timer'])
+        _stages.reset(session['token'])
+
+    def _finish(self, request, response, session):
+        stages, gc_timer = session['stages'], session['gc_timer']
+        if gc_timer.collections:
+            stages['gc'] = [gc_timer.collections, gc_timer.seconds]
+        try:
+            self._write(request, response, session['profiler'], session['duration'], stages)
+        except Exception:
+            # profiling 失敗不能影響請求本身
+            logger.exception("Failed to write profile for %s", request.path)
+
+    def process_template_response(self, request, response):
+        # DRF 的 Response 在 view 之後才序列化，另外量 render 的時間
+        stages = _stages.get()
+        if stages is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: record_stage('render', time.perf_counter() - started)
+            )
+        return response
+
+    def _write(self, request, response, profiler, duration, stages):
+        directory = get_profiling_dir()
+        os.makedirs(directory, exist_ok=True)
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match is not None else 'unmatched'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_-]', '_', endpoint)}-{uuid.uuid4().hex[:8]}"
+        base = os.path.join(directory, name)
+
+        profile_path = profiler.dump(base)
+        meta = {
+            'endpoint': endpoint,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_seconds': duration,
+            'backend': profiler.backend,
+            'profile': os.path.basename(profile_path),
+            'pid': os.getpid(),
+            'stages': {
+                stage: {'count': count, 'seconds': seconds}
+                for stage, (count, seconds) in sorted(stages.items(), key=lambda item: -item[1][1])
+            },
+        }
+        with open(f"{base}.json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        self._prune(directory)
+
+    def _prune(self, directory):
+        """只保留最新的 PROFILING_MAX_DUMPS 份，避免塞爆磁碟"""
+        limit = getattr(settings, 'PROFILING_MAX_DUMPS', 200)
+        metas = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in metas[:max(0, len(metas) - limit)]:
+            stem = entry.path[:-len('.json')]
+            for suffix in ('.json', '.prof', '.html'):
+                if os.path.exists(stem + suffix):
+                    os.remove(stem + suffix)
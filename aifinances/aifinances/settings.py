@@ -38,8 +38,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'aifinances.metrics.MetricsMiddleware',  # 放最前面，量到完整的請求時間
+    'aifinances.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # 靜態檔案處理
+    'aifinances.middleware.WhiteNoiseMiddleware',  # 靜態檔案處理（支援 ASGI）
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS 必須在 CommonMiddleware 前
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +91,9 @@ DATABASES = {
     )
 }
 
+# 使用者沿用 auth_user 資料表，email 不分大小寫唯一（舊資料庫先執行 manage.py adopt_user_model）
+AUTH_USER_MODEL = 'users.User'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,7 +138,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Rest Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_RENDERER_CLASSES': [
@@ -167,7 +172,13 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Token 驗證快取的共用層：同一台主機的所有 worker 共用，撤銷 token 時其他 worker 也看得到
+    'auth_tokens': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('AUTH_TOKEN_CACHE_DIR', '/tmp/aifinances/auth_tokens'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
 # Logging 配置
@@ -190,12 +201,116 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO',
     },
+    # 預測與股票模組的 log 等級，排查問題時可設成 DEBUG
+    'loggers': {
+        'prediction': {
+            'level': os.environ.get('PREDICTION_LOG_LEVEL', 'INFO'),
+        },
+        'stocks': {
+            'level': os.environ.get('STOCKS_LOG_LEVEL', 'INFO'),
+        },
+    },
 }
 
+# ASGI 部署（GUNICORN_MODE=asgi）時 stocks 與 prediction 改用 async view
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', 'False') == 'True'
+
+# Prometheus /metrics，只允許本機或內網抓取；不走 HTTPS 轉址
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+SECURE_REDIRECT_EXEMPT = [r'^metrics$']
+
+# 請求 profiling（預設關閉）：依取樣率或帶 X-Profile: <PROFILING_TOKEN> 觸發
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_PATHS = ['/prediction/', '/stocks/']
+PROFILING_BACKEND = os.environ.get('PROFILING_BACKEND', 'cprofile')  # 或 'pyinstrument'
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/aifinances/profiles')
+PROFILING_MAX_DUMPS = 200
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# 預測用的測試資料與特徵庫（由 manage.py build_feature_store 產生）
+PREDICTION_DATA_DIR = os.environ.get(
+    'PREDICTION_DATA_DIR',
+    os.path.join(BASE_DIR, 'prediction', 'data_splits'),
+)
+PREDICTION_FEATURE_STORE_DIR = os.environ.get(
+    'PREDICTION_FEATURE_STORE_DIR',
+    os.path.join(BASE_DIR, 'prediction', 'feature_store'),
+)
+PREDICTION_MODELS_DIR = os.environ.get(
+    'PREDICTION_MODELS_DIR',
+    os.path.join(BASE_DIR, 'prediction', 'saved_models'),
+)
+
+# 資料與模型檔的 SHA-1 快取（依路徑、大小、修改時間），同一台主機的 worker 載入時不必重新讀整個 CSV
+PREDICTION_DIGEST_CACHE_PATH = os.environ.get('PREDICTION_DIGEST_CACHE_PATH', '/tmp/aifinances/file_digests.json')
+
+# 啟動時預先載入 predictor，並每隔幾秒檢查資料檔是否更新
+PREDICTION_PRELOAD = os.environ.get('PREDICTION_PRELOAD', 'False') == 'True'
+PREDICTION_RELOAD_INTERVAL = int(os.environ.get('PREDICTION_RELOAD_INTERVAL', 30))
+# 預先載入 predictor 時是否一併載入五天的模型（搭配 gunicorn preload_app 在 fork 前共用）
+PREDICTION_PRELOAD_MODELS = os.environ.get('PREDICTION_PRELOAD_MODELS', 'False') == 'True'
+
+# Day1~Day5 平行讀取與預測的執行緒數。PREDICTION_DAY_EXECUTOR='process' 只把沒有特徵庫時的
+# CSV 解析交給 process pool；特徵庫查詢與 XGBoost 預測一律在執行緒池執行（XGBoost 預測時會釋放 GIL，
+# 模型也不必在每個子 process 各載入一份）
+PREDICTION_DAY_WORKERS = int(os.environ.get('PREDICTION_DAY_WORKERS', 5))
+PREDICTION_DAY_EXECUTOR = os.environ.get('PREDICTION_DAY_EXECUTOR', 'thread')
+# 沒有特徵庫、直接掃描 CSV 時每一塊可以使用的記憶體（bytes），決定 chunk 的列數
+PREDICTION_SCAN_MEMORY_BUDGET = int(os.environ.get('PREDICTION_SCAN_MEMORY_BUDGET', 32 * 1024 * 1024))
+
+# Token 驗證快取：process 內 LRU 的大小與秒數
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_TOKEN_CACHE_MAX_ENTRIES', 4096))
+AUTH_TOKEN_CACHE_LOCAL_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_LOCAL_TTL', 60))
+# 共用層：CACHES 裡所有 worker 共用的 cache 的名稱與秒數，也用來傳遞撤銷（每個使用者的版本號）。
+# 預設是本機的檔案快取，多台主機時改成 Redis / Memcached；設成空字串或 LocMemCache 時只用 LRU，
+# 其他 worker 撤銷的 token 最多在 LOCAL_TTL 秒後才失效
+AUTH_TOKEN_SHARED_CACHE = os.environ.get('AUTH_TOKEN_SHARED_CACHE', 'auth_tokens')
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300))
+
+# 密碼雜湊（登入、註冊、改密碼）在 process pool 執行；每個 gunicorn worker 各有一個 pool，
+# 預設只開一個子 process，避免 worker 數 x CPU 數個 PBKDF2 子 process 互搶 CPU。
+# 每個 worker 同時最多 MAX_PENDING 個（執行中加排隊），超過時回 503 + Retry-After。
+# 預設是 gthread 執行緒數減一，至少留一條執行緒給其他 API（和 gunicorn.conf.py 同一個 GUNICORN_THREADS）
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 2))
+USERS_HASHING_WORKERS = int(os.environ.get('USERS_HASHING_WORKERS', 1))
+USERS_HASHING_MAX_PENDING = int(os.environ.get('USERS_HASHING_MAX_PENDING', max(1, GUNICORN_THREADS - 1)))
+USERS_HASHING_TIMEOUT = 10
+USERS_HASHING_RETRY_AFTER = 1
+
+# 預測結果快取（LRU + TTL），資料或模型更新時自動失效
+PREDICTION_CACHE_MAX_ENTRIES = 1024
+PREDICTION_CACHE_TTL = 3600
+
+# 批次預測上限，超過 CHUNK_SIZE 時分批串流輸出
+PREDICTION_BATCH_MAX_CODES = 200
+PREDICTION_BATCH_CHUNK_SIZE = 50
+
+# 非同步預測工作的 process pool 大小與逾時秒數
+PREDICTION_JOB_WORKERS = int(os.environ.get('PREDICTION_JOB_WORKERS', 2))
+PREDICTION_JOB_TIMEOUT = 120
+
+# finlab 公司基本資料快照，同一台主機的所有 worker 共用一個 mmap 檔案
+FINLAB_API_TOKEN = os.environ.get(
+    'FINLAB_API_TOKEN',
+    'r0K9y4lF4EhgdSIjBVE5vY7ZKMhXqNr/N0yWFGz/keCB1a87U4N1xykyUlLu9B7S#vip_m',
+)
+STOCKS_CATALOG_PATH = os.environ.get('STOCKS_CATALOG_PATH', '/tmp/aifinances/company_catalog.npy')
+STOCKS_CATALOG_MAX_AGE = 86400
+# 測試時可以指定本地 CSV 取代 finlab
+STOCKS_CATALOG_FIXTURE = os.environ.get('STOCKS_CATALOG_FIXTURE')
+
+# 收藏清單每頁筆數（cursor 分頁），客戶端可用 ?page_size= 調整，上限 MAX_PAGE_SIZE
+STOCKS_FAVORITES_PAGE_SIZE = 50
+STOCKS_FAVORITES_MAX_PAGE_SIZE = 200
+# 批次加入 / 取消收藏一次最多幾檔
+STOCKS_FAVORITES_BULK_MAX = 200
+
 # 檔案上傳設定
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
\ No newline at end of file
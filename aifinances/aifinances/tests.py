@@ -0,0 +1,139 @@
+import gc
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from . import pools, warmup
+from .metrics import CONTENT_TYPE, REGISTRY
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    """/metrics 只開放給 METRICS_ALLOWED_IPS，其他來源一律 404"""
+
+    def scrape(self, remote_addr):
+        return self.client.get('/metrics', REMOTE_ADDR=remote_addr)
+
+    def test_localhost_allowed_by_default(self):
+        for address in ('127.0.0.1', '::1'):
+            response = self.scrape(address)
+            self.assertEqual(response.status_code, 200, address)
+            self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+            self.assertIn('aifinances_http_request_duration_seconds', response.content.decode())
+
+    def test_other_clients_get_404(self):
+        for address in ('10.0.0.5', '192.168.1.20', '2001:db8::1', 'not-an-ip', ''):
+            self.assertEqual(self.scrape(address).status_code, 404, address)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_allowlist_accepts_networks(self):
+        self.assertEqual(self.scrape('10.20.30.40').status_code, 200)
+        self.assertEqual(self.scrape('11.0.0.1').status_code, 404)
+        self.assertEqual(self.scrape('127.0.0.1').status_code, 404)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(self.scrape('127.0.0.1').status_code, 404)
+
+    def test_renders_registered_metrics(self):
+        body = self.scrape('127.0.0.1').content.decode()
+        for name in REGISTRY._metrics:
+            self.assertIn(f'# TYPE {name} ', body)
+
+
+class WarmupPredictor:
+    """只記錄暖機呼叫了哪些預測，不載入特徵庫與模型"""
+    days = ('Day1',)
+
+    def __init__(self):
+        self.feature_store = self
+        self.predicted = []
+        self.batches = []
+
+    def table(self, day):
+        return self
+
+    def codes(self):
+        return ['2330', '2317', '2454']
+
+    def predict(self, code):
+        self.predicted.append(code)
+
+    def predict_many(self, codes):
+        self.batches.append(list(codes))
+
+
+class WarmupTests(SimpleTestCase):
+    """preload 暖機：載入快照與索引、跑過預測路徑後 gc.freeze()；fork 後清掉 master 的狀態"""
+
+    def setUp(self):
+        from stocks import catalog
+        from stocks.cache import catalog_cache
+
+        def reset_catalog():
+            catalog._catalog = None
+            catalog._catalog_stat = None
+            catalog_cache.clear()
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        override = override_settings(
+            STOCKS_CATALOG_PATH=os.path.join(tmp, 'company_catalog.npy'),
+            STOCKS_CATALOG_FIXTURE=os.path.join(os.path.dirname(catalog.__file__), 'fixtures', 'company_basic_info.csv'),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_catalog()
+        self.addCleanup(reset_catalog)
+        self.addCleanup(gc.unfreeze)
+        self.catalog_cache = catalog_cache
+        self.predictor = WarmupPredictor()
+
+    def test_warm_up_loads_catalog_and_runs_predictions(self):
+        with mock.patch.object(warmup, '_load_predictor', return_value=self.predictor):
+            timings = warmup.warm_up(sample_size=2)
+
+        self.assertEqual(set(timings), {'catalog', 'predictor', 'requests', 'frozen_objects'})
+        self.assertGreater(timings['frozen_objects'], 0)
+        self.assertEqual(set(self.catalog_cache.stats()), {
+            self.catalog_cache.key('records'), self.catalog_cache.key('search_index'),
+        })
+        self.assertEqual(self.predictor.predicted, ['2330', '2317'])
+        self.assertEqual(self.predictor.batches, [['2330', '2317']])
+
+    def test_failed_stage_does_not_stop_warm_up(self):
+        with mock.patch.object(warmup, '_load_predictor', side_effect=RuntimeError('no models')), \
+                self.assertLogs('aifinances.warmup', 'ERROR'):
+            timings = warmup.warm_up()
+
+        # 預測器載入失敗就不跑暖機請求，其餘照常完成
+        self.assertIn('predictor', timings)
+        self.assertNotIn('requests', timings)
+        self.assertTrue(self.catalog_cache.stats())
+        self.assertGreater(timings['frozen_objects'], 0)
+
+    def test_warm_up_closes_database_connections(self):
+        with mock.patch.object(warmup, '_load_predictor', return_value=self.predictor), \
+                mock.patch.object(warmup.connections, 'close_all') as close_all:
+            warmup.warm_up()
+        close_all.assert_called_once_with()
+
+    def test_after_fork_resets_metrics_and_pools(self):
+        histogram = REGISTRY.get('aifinances_http_request_duration_seconds')
+        histogram.observe(0.1, view='test', method='GET', status=200)
+        self.assertEqual(histogram.value(view='test', method='GET', status=200)['count'], 1)
+        pool = pools.WorkerProcessPool(lambda: 1)
+        self.addCleanup(pools._pools.remove, pool)
+        master_executor = mock.Mock()
+        pool.executor = master_executor
+        master_lock = pool._lock
+
+        warmup.after_fork()
+
+        self.assertEqual(histogram.value(view='test', method='GET', status=200)['count'], 0)
+        self.assertIsNone(pool.executor)
+        self.assertIsNot(pool._lock, master_lock)
+        # 不能在子 process 關掉 master 的 pool
+        master_executor.shutdown.assert_not_called()
@@ -26,8 +26,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('users/', include('users.urls', namespace='users')),
     path('prediction/', include('prediction.urls', namespace='prediction')),
     path('stocks/', include('stocks.urls', namespace='stocks'))
@@ -0,0 +1,108 @@
+"""
+gunicorn preload_app 用的啟動流程：在 master fork worker 之前載入所有共用資料並暖機，
+worker（包含 max_requests 回收後重新 fork 的）一啟動就是熱的，記憶體也以 copy-on-write 共用。
+"""
+import gc
+import logging
+import time
+
+from django.db import connections
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+# 暖機時解析一次的 URL，讓 URL resolver 與各 view 模組先載入
+WARMUP_PATHS = [
+    '/prediction/predict/',
+    '/prediction/predict/batch/',
+    '/stocks/search/',
+    '/stocks/random-stocks/',
+    '/stocks/favorites/',
+]
+
+
+def _load_catalog():
+    from stocks.cache import catalog_cache
+    from stocks.catalog import build_records, get_catalog
+    from stocks.search_index import build_search_index
+
+    catalog = get_catalog()
+    catalog_cache.get('records', build_records)
+    catalog_cache.get('search_index', build_search_index)
+    return len(catalog)
+
+
+def _load_predictor():
+    from prediction.registry import get_predictor
+
+    predictor = get_predictor()
+    for day in predictor.days:
+        predictor.feature_store.table(day)
+    predictor.engine.preload()
+    return predictor
+
+
+def _warmup_requests(predictor, sample_size):
+    """跑一輪和線上請求相同的程式路徑（不經過資料庫）"""
+    from stocks.models import get_company_records, get_random_stocks, search_stocks
+
+    for path in WARMUP_PATHS:
+        resolve(path)
+
+    for record in get_company_records()[:sample_size]:
+        search_stocks(record['stock_id'][:2])
+        search_stocks(record['公司簡稱'][:2])
+    get_random_stocks(5)
+
+    codes = []
+    for day in predictor.days:
+        table = predictor.feature_store.table(day)
+        if table is not None:
+            codes = table.codes()[:sample_size]
+            break
+    for code in codes:
+        predictor.predict(code)
+    if codes:
+        predictor.predict_many(codes)
+    return len(codes)
+
+
+def warm_up(sample_size=5):
+    """載入公司快照、搜尋索引、特徵庫與模型並暖機，最後 gc.freeze()，回傳各階段秒數"""
+    timings = {}
+
+    def stage(name, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception:
+            # 某一部分失敗時照常啟動，該部分在第一個請求時再載入
+            logger.exception("Warmup stage %s failed", name)
+            return None
+        finally:
+            timings[name] = time.perf_counter() - started
+
+    stage('catalog', _load_catalog)
+    predictor = stage('predictor', _load_predictor)
+    if predictor is not None:
+        stage('requests', _warmup_requests, predictor, sample_size)
+
+    # master 不能帶著資料庫連線 fork，子 process 共用同一條連線會出錯
+    connections.close_all()
+
+    # 把目前所有物件移到 permanent generation，GC 不再掃描（也不會因此寫入而破壞 copy-on-write）
+    gc.collect()
+    gc.freeze()
+    timings['frozen_objects'] = gc.get_freeze_count()
+    return timings
+
+
+def after_fork():
+    """worker fork 後呼叫：清掉不能跨 process 共用的狀態"""
+    from aifinances import pools
+    from aifinances.metrics import REGISTRY
+
+    # 暖機的計數屬於 master，worker 從零開始
+    REGISTRY.reset()
+    # master 的 process pool 不能在子 process 使用
+    pools.after_fork()
@@ -0,0 +1,120 @@
+"""
+登入延遲隨使用者數量的變化：在 aifinances 目錄下執行
+
+    python -m benchmarks.login_scaling --users 1000 10000 100000
+
+每一階段把使用者補到指定數量，量測 email 查詢（走 Lower(email) 索引）、
+舊寫法 email= 查詢（沒有索引，整張表掃描）以及 POST /users/login/ 的延遲。
+預設改用 MD5 雜湊，讓登入延遲反映查詢成本而不是 PBKDF2；--hasher default 則用正式設定。
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.run import git_commit, measure
+
+PASSWORD = 'Bench-password-1'
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def setup_django():
+    import django
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def grow_users(count, password_hash, batch_size=5000):
+    """把使用者補到 count 個（已經有的不重建）"""
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    existing = User.objects.filter(username__startswith='login_bench_').count()
+    for start in range(existing, count, batch_size):
+        User.objects.bulk_create([
+            User(
+                username=f'login_bench_{index}',
+                email=f'login_bench_{index}@example.com',
+                password=password_hash,
+            )
+            for index in range(start, min(start + batch_size, count))
+        ])
+
+
+def login_benchmarks(count, iterations):
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+
+    User = get_user_model()
+    client = APIClient()
+
+    def email():
+        return f'login_bench_{random.randrange(count)}@example.com'
+
+    def login():
+        # 用大寫 email 登入，確認查詢不分大小寫
+        response = client.post('/users/login/', {'email': email().upper(), 'password': PASSWORD}, format='json')
+        return response.status_code == 200
+
+    return [
+        measure(f'by_email[{count}]', lambda: User.objects.by_email(email()).exists(), iterations),
+        measure(f'email= unindexed[{count}]', lambda: User.objects.filter(email=email()).exists(), iterations),
+        measure(f'POST /users/login/[{count}]', login, iterations),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='登入延遲與使用者數量')
+    parser.add_argument('--workdir', default=os.environ.get('BENCHMARK_DIR', '/tmp/aifinances-bench-login'))
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--hasher', choices=['md5', 'default'], default='md5')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='結果 JSON 路徑，預設為 workdir/login_scaling.json')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    os.environ['BENCHMARK_DIR'] = args.workdir
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    random.seed(args.seed)
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+
+    if args.hasher == 'md5':
+        settings.PASSWORD_HASHERS = FAST_HASHERS
+    password_hash = make_password(PASSWORD)
+
+    results = []
+    for count in sorted(args.users):
+        grow_users(count, password_hash)
+        results += login_benchmarks(count, args.iterations)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'params': {'users': sorted(args.users), 'iterations': args.iterations, 'hasher': args.hasher},
+        'results': results,
+    }
+    output = args.output or os.path.join(args.workdir, 'login_scaling.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for result in results:
+        print(
+            f"{result['name']:<36} p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  "
+            f"{result['throughput_per_s']:>10.1f}/s  errors {result['errors']}"
+        )
+    print(f"結果已寫入 {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+離線 benchmark：在 aifinances 目錄下執行
+
+    python -m benchmarks.run --rows 55150 --output bench.json
+
+會產生假資料（data_splits、公司清單、小型模型）、建立 SQLite 資料庫，
+量測 predictor / 搜尋 / 隨機股票與每個 API endpoint 的 p50/p99 延遲、
+吞吐量與每一項的 peak RSS，結果寫成 JSON 方便在不同 commit 間比較。
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 回傳 KB，macOS 回傳 bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _proc_status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """把 Linux 的 VmHWM 歸零，之後讀到的峰值只涵蓋這一項 benchmark；不支援時回傳 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return _proc_status_mb('VmHWM') is not None
+
+
+def measure(name, func, iterations, warmup=2):
+    """執行 func 多次並回傳延遲統計；func 回傳 False 時記為錯誤
+
+    ru_maxrss 是整個 process 的歷史最高值，只會變大，後面的 benchmark 會沿用前面的峰值。
+    Linux 上每一項開始前把 VmHWM 歸零，peak_rss_mb 是這一項期間的峰值，
+    rss_delta_mb 是峰值減去開始時的 RSS；其他平台只能回報整個 process 的峰值（rss_scope: process）。
+    """
+    per_benchmark = reset_peak_rss()
+    baseline = _proc_status_mb('VmRSS') if per_benchmark else None
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        if func() is False:
+            errors += 1
+        samples.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    peak = _proc_status_mb('VmHWM') if per_benchmark else peak_rss_mb()
+
+    return {
+        'name': name,
+        'iterations': iterations,
+        'errors': errors,
+        'p50_ms': round(percentile(samples, 50) * 1000, 4),
+        'p99_ms': round(percentile(samples, 99) * 1000, 4),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 4),
+        'throughput_per_s': round(iterations / elapsed, 2),
+        'peak_rss_mb': round(peak, 1),
+        'rss_delta_mb': round(peak - baseline, 1) if per_benchmark else None,
+        'rss_scope': 'benchmark' if per_benchmark else 'process',
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_data(args):
+    from benchmarks import synthetic
+
+    marker = os.path.join(args.workdir, 'params.json')
+    params = {'rows': args.rows, 'companies': args.companies, 'seed': args.seed, 'models': not args.no_models}
+    if not args.regenerate and os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == params:
+                return
+    os.makedirs(args.workdir, exist_ok=True)
+    synthetic.generate(args.workdir, args.rows, args.companies, args.seed, models=not args.no_models)
+    with open(marker, 'w') as f:
+        json.dump(params, f)
+
+
+def setup_django():
+    import django
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    call_command('build_feature_store', stdout=io.StringIO())
+    call_command('convert_models', stdout=io.StringIO())
+    call_command('refresh_company_catalog', stdout=io.StringIO())
+
+
+def make_client(username, password):
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    User = get_user_model()
+    user = User.objects.filter(username=username).first()
+    if user is None:
+        user = User.objects.create_user(username=username, email=f'{username}@example.com', password=password)
+    else:
+        user.set_password(password)
+        user.save()
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return user, client
+
+
+def library_benchmarks(args, codes, queries):
+    from prediction.models import StockPredictor
+    from prediction.registry import get_predictor
+    from stocks.models import get_random_stocks, search_stocks
+
+    predictor = get_predictor()
+    csv_predictor = StockPredictor()
+    csv_predictor.feature_store.store_dir = os.path.join(args.workdir, 'missing')
+
+    return [
+        measure('StockPredictor.predict', lambda: predictor.predict(random.choice(codes)) is not None, args.iterations),
+        measure(
+            'StockPredictor.predict_many[30]',
+            lambda: bool(predictor.predict_many(random.sample(codes, 30))),
+            args.iterations,
+        ),
+        measure(
+            'StockPredictor.predict[csv_scan]',
+            lambda: csv_predictor.predict(random.choice(codes)) is not None,
+            args.slow_iterations,
+            warmup=0,
+        ),
+        measure('search_stocks', lambda: search_stocks(random.choice(queries)) is not None, args.iterations),
+        measure('get_random_stocks', lambda: len(get_random_stocks(5)) == 5, args.iterations),
+    ]
+
+
+def endpoint_benchmarks(args, codes, queries):
+    from django.core import mail
+    from django.core.cache import cache
+
+    password = 'Bench-password-1'
+    user, client = make_client('bench', password)
+    counter = {'n': 0}
+
+    def ok(response, expected=200):
+        return response.status_code == expected
+
+    def next_id():
+        counter['n'] += 1
+        return counter['n']
+
+    # 先放一些收藏讓列表有資料，新增/刪除用其他的代碼避免撞到
+    listed, free = codes[:20], codes[20:]
+    for stock_id in listed:
+        client.post('/stocks/favorites/add/', {'stock_id': str(stock_id), 'stock_name': 'bench'}, format='json')
+
+    # 收藏很多的使用者：第一頁和翻到很後面的一頁成本應該一樣
+    from stocks.models import FavoriteStock
+    power_user, power_client = make_client('bench_power', password)
+    if not FavoriteStock.objects.filter(user=power_user).exists():
+        FavoriteStock.objects.bulk_create([
+            FavoriteStock(user=power_user, stock_id=str(index), stock_name='bench')
+            for index in range(args.power_favorites)
+        ])
+    deep_page = '/stocks/favorites/'
+    for _ in range(args.power_favorites // 50 - 1):
+        next_page = power_client.get(deep_page).json()['next']
+        if next_page is None:
+            break
+        deep_page = next_page
+
+    def add_remove_favorite():
+        stock_id = str(random.choice(free))
+        added = client.post('/stocks/favorites/add/', {'stock_id': stock_id, 'stock_name': 'bench'}, format='json')
+        removed = client.delete(f'/stocks/favorites/{stock_id}/remove/')
+        return ok(added) and ok(removed)
+
+    def bulk_add_remove_favorites():
+        stocks = [{'stock_id': str(stock_id), 'stock_name': 'bench'} for stock_id in random.sample(free, 50)]
+        added = client.post('/stocks/favorites/bulk/', {'stocks': stocks}, format='json')
+        removed = client.delete('/stocks/favorites/bulk/', {'stocks': stocks}, format='json')
+        return ok(added) and ok(removed) and removed.json()['count'] == len(stocks)
+
+    def register():
+        n = next_id()
+        response = client.post('/users/register/', {
+            'username': f'bench_user_{n}_{time.time_ns()}',
+            'email': f'bench_{n}_{time.time_ns()}@example.com',
+            'password': password,
+        }, format='json')
+        return ok(response, 201)
+
+    def forget_password():
+        mail.outbox = []
+        return ok(client.post('/users/forget-password/', {'email': user.email}, format='json'))
+
+    def verify_otp():
+        cache.set(f'otp_{user.email}', '1234', timeout=300)
+        return ok(client.post('/users/verify-otp/', {'email': user.email, 'otp': '1234'}, format='json'))
+
+    def update_password():
+        response = client.put('/users/update-password/', {
+            'old_password': password, 'new_password': password,
+        }, format='json')
+        if not ok(response):
+            return False
+        client.credentials(HTTP_AUTHORIZATION=f"Token {response.json()['newToken']}")
+        return True
+
+    n, auth_n = args.iterations, args.auth_iterations
+    return [
+        measure('POST /prediction/predict/', lambda: ok(client.post(
+            '/prediction/predict/', {'company_code': str(random.choice(codes))}, format='json')), n),
+        measure('POST /prediction/predict/batch/', lambda: ok(client.post(
+            '/prediction/predict/batch/',
+            {'company_codes': [str(code) for code in random.sample(codes, 30)]}, format='json')), n),
+        measure('GET /stocks/random-stocks/', lambda: ok(client.get('/stocks/random-stocks/', {'count': 5})), n),
+        measure('GET /stocks/search/', lambda: ok(client.get('/stocks/search/', {'q': random.choice(queries)})), n),
+        measure('GET /stocks/favorites/', lambda: ok(client.get('/stocks/favorites/')), n),
+        measure(f'GET /stocks/favorites/[{args.power_favorites}, first]', lambda: ok(
+            power_client.get('/stocks/favorites/')), n),
+        measure(f'GET /stocks/favorites/[{args.power_favorites}, last]', lambda: ok(
+            power_client.get(deep_page)), n),
+        measure('POST+DELETE /stocks/favorites/', add_remove_favorite, n),
+        measure('POST+DELETE /stocks/favorites/bulk/[50]', bulk_add_remove_favorites, n),
+        measure('POST /users/login/', lambda: ok(client.post(
+            '/users/login/', {'email': user.email, 'password': password}, format='json')), auth_n),
+        measure('POST /users/register/', register, auth_n),
+        measure('PUT /users/update-profile/', lambda: ok(client.put(
+            '/users/update-profile/', {'username': 'bench'}, format='json')), n),
+        measure('POST /users/forget-password/', forget_password, n),
+        measure('POST /users/verify-otp/', verify_otp, n),
+        measure('POST /users/ResetPassword/', lambda: ok(client.post(
+            '/users/ResetPassword/', {'email': user.email, 'new_password': password}, format='json')), auth_n),
+        measure('PUT /users/update-password/', update_password, auth_n),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AIFinances 離線 benchmark')
+    parser.add_argument('--workdir', default=os.environ.get('BENCHMARK_DIR', '/tmp/aifinances-bench'))
+    parser.add_argument('--rows', type=int, default=55150, help='每天 X_test_raw.csv 的列數')
+    parser.add_argument('--companies', type=int, default=1800)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--slow-iterations', type=int, default=5, help='CSV 掃描等慢速路徑的次數')
+    parser.add_argument('--auth-iterations', type=int, default=10, help='需要密碼雜湊的 endpoint 次數')
+    parser.add_argument('--power-favorites', type=int, default=5000, help='收藏分頁測試用的收藏筆數')
+    parser.add_argument('--no-models', action='store_true', help='不訓練假模型，改用 Future_Price_Change')
+    parser.add_argument('--regenerate', action='store_true')
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--output', default=None, help='結果 JSON 路徑，預設為 workdir/results.json')
+    args = parser.parse_args(argv)
+
+    os.environ['BENCHMARK_DIR'] = args.workdir
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    random.seed(args.seed)
+
+    prepare_data(args)
+    setup_django()
+
+    from benchmarks.synthetic import company_codes
+    from stocks.models import get_company_records
+
+    codes = company_codes(args.companies).tolist()
+    records = get_company_records()
+    queries = [record['stock_id'][:2] for record in records[:50]]
+    queries += [record['公司簡稱'][:2] for record in records[:50]]
+
+    results = library_benchmarks(args, codes, queries)
+    if not args.skip_endpoints:
+        results += endpoint_benchmarks(args, codes, queries)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'rows': args.rows,
+            'companies': args.companies,
+            'iterations': args.iterations,
+            'models': not args.no_models,
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(args.workdir, 'results.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for result in results:
+        print(
+            f"{result['name']:<36} p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  "
+            f"{result['throughput_per_s']:>10.1f}/s  rss {result['peak_rss_mb']:>8.1f} MB  "
+            f"+{result['rss_delta_mb'] if result['rss_delta_mb'] is not None else '-':>6} MB  errors {result['errors']}"
+        )
+    print(f"結果已寫入 {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+離線 benchmark 用的設定：SQLite、本地假資料，不連外部服務。
+"""
+import os
+
+from aifinances.settings import *  # noqa: F401,F403
+
+BENCHMARK_DIR = os.environ.get('BENCHMARK_DIR', '/tmp/aifinances-bench')
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BENCHMARK_DIR, 'db.sqlite3'),
+    }
+}
+
+DEBUG = False
+SECURE_SSL_REDIRECT = False
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# 不限流，否則 user 1000/day 會擋住 benchmark
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_THROTTLE_CLASSES': [],
+}
+
+PREDICTION_DATA_DIR = os.path.join(BENCHMARK_DIR, 'data_splits')
+PREDICTION_FEATURE_STORE_DIR = os.path.join(BENCHMARK_DIR, 'feature_store')
+PREDICTION_MODELS_DIR = os.path.join(BENCHMARK_DIR, 'saved_models')
+PREDICTION_RELOAD_INTERVAL = None
+
+STOCKS_CATALOG_PATH = os.path.join(BENCHMARK_DIR, 'company_catalog.npy')
+STOCKS_CATALOG_FIXTURE = os.path.join(BENCHMARK_DIR, 'company_basic_info.csv')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {'handlers': [], 'level': 'ERROR'},
+}
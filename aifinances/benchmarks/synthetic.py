@@ -0,0 +1,99 @@
+"""
+產生離線 benchmark 用的假資料：data_splits、finlab 公司清單與小型 XGBoost 模型。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+DAYS = ['Day1', 'Day2', 'Day3', 'Day4', 'Day5']
+# 與目前 y_test_raw.csv 相同的列數
+BASELINE_ROWS = 55150
+REPO_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prediction', 'saved_models')
+
+
+def feature_names(day):
+    """沿用 repo 內 selected_features_DayN.txt 的欄位名稱"""
+    from prediction.inference import read_feature_list
+    path = os.path.join(REPO_MODELS_DIR, day, f'selected_features_{day}.txt')
+    return read_feature_list(path)
+
+
+def company_codes(companies):
+    return np.arange(1101, 1101 + companies, dtype=np.int64)
+
+
+def write_data_splits(out_dir, rows=BASELINE_ROWS, companies=1800, seed=0, chunk_rows=500000):
+    """每天寫一份 X_test_raw.csv / y_test_raw.csv，分塊寫入避免大規模時吃光記憶體"""
+    rng = np.random.default_rng(seed)
+    codes = company_codes(companies)
+
+    for day in DAYS:
+        day_dir = os.path.join(out_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        features = [name for name in feature_names(day) if name != 'Company Code']
+        x_path = os.path.join(day_dir, 'X_test_raw.csv')
+        y_path = os.path.join(day_dir, 'y_test_raw.csv')
+
+        written = 0
+        with open(x_path, 'w', encoding='utf-8', newline='') as x_file, \
+                open(y_path, 'w', encoding='utf-8', newline='') as y_file:
+            while written < rows:
+                size = min(chunk_rows, rows - written)
+                frame = pd.DataFrame(
+                    rng.normal(size=(size, len(features))).astype(np.float32),
+                    columns=features,
+                )
+                frame.insert(0, 'Company Code', rng.choice(codes, size))
+                frame['Future_Price_Change'] = rng.normal(size=size).astype(np.float32)
+                frame.to_csv(x_file, index=False, header=written == 0)
+                pd.Series(rng.integers(0, 3, size)).to_csv(y_file, index=False, header=False)
+                written += size
+    return out_dir
+
+
+def write_company_fixture(path, companies=1800, seed=0):
+    """假的 finlab company_basic_info，公司簡稱用常見中文字組合"""
+    rng = np.random.default_rng(seed)
+    chars = list('台積電鴻海聯發科中華國泰富邦統一大立光長榮華碩廣達日月南亞塑膠鋼鐵金控銀行')
+    names = [''.join(rng.choice(chars, rng.integers(2, 5))) for _ in range(companies)]
+    pd.DataFrame({
+        'stock_id': company_codes(companies).astype(str),
+        '公司簡稱': names,
+    }).to_csv(path, index=False)
+    return path
+
+
+def write_models(data_dir, out_dir, train_rows=5000, seed=0):
+    """用假資料訓練很小的模型，檔案格式與 saved_models/DayN 相同"""
+    import joblib
+    import xgboost as xgb
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    for day in DAYS:
+        day_dir = os.path.join(out_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        names = feature_names(day)
+        frame = pd.read_csv(os.path.join(data_dir, day, 'X_test_raw.csv'), nrows=train_rows)
+
+        numeric = [name for name in names if name != 'Company Code']
+        preprocessor = StandardScaler().fit(frame[numeric])
+        X = pd.DataFrame(preprocessor.transform(frame[numeric]), columns=numeric)
+        X.insert(0, 'Company Code', frame['Company Code'])
+        model = xgb.XGBClassifier(n_estimators=20, max_depth=4)
+        model.fit(X[names], rng.integers(0, 3, len(X)))
+
+        joblib.dump(model, os.path.join(day_dir, 'XGBoost_model.pkl'))
+        joblib.dump(preprocessor, os.path.join(day_dir, f'preprocessor_{day}.pkl'))
+        with open(os.path.join(day_dir, f'selected_features_{day}.txt'), 'wb') as f:
+            f.write('\r\n'.join(names).encode('big5'))
+    return out_dir
+
+
+def generate(out_dir, rows=BASELINE_ROWS, companies=1800, seed=0, models=True):
+    write_data_splits(os.path.join(out_dir, 'data_splits'), rows, companies, seed)
+    write_company_fixture(os.path.join(out_dir, 'company_basic_info.csv'), companies, seed)
+    if models:
+        write_models(os.path.join(out_dir, 'data_splits'), os.path.join(out_dir, 'saved_models'), seed=seed)
+    return out_dir
@@ -11,5 +11,17 @@ export PYTHONPATH="${PYTHONPATH}:/opt/render/project/src/aifinances"
 # 收集靜態檔案
 python manage.py collectstatic --no-input
 
+# 既有資料庫改用 users.User 前先補上 migration 紀錄（已處理過或新資料庫時不做事）
+python manage.py adopt_user_model
+
 # 運行資料庫遷移
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# 建立預測用的特徵庫
+python manage.py build_feature_store
+
+# 把模型轉成 XGBoost 原生格式，worker 啟動時不必再讀 pickle
+python manage.py convert_models
+
+# 預先計算所有公司的預測結果
+python manage.py precompute_predictions
\ No newline at end of file
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PredictionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prediction'
+
+    def ready(self):
+        # 啟動時先載入 predictor，避免第一個請求付出載入成本
+        if getattr(settings, 'PREDICTION_PRELOAD', False):
+            from .registry import get_predictor
+            predictor = get_predictor()
+            if getattr(settings, 'PREDICTION_PRELOAD_MODELS', False):
+                predictor.engine.preload()
@@ -0,0 +1,154 @@
+"""
+ASGI 模式（ASYNC_VIEWS=True）使用的 async 版本 view，回應格式與 views.py 相同。
+
+ASGI 下同步的 view 全部排在同一個執行緒執行，pandas / XGBoost 的預測會互相卡住，
+所以這裡把預測丟到 executor，資料庫查詢仍走 Django 的 thread-sensitive 執行緒。
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from aifinances.async_api import AsyncAPIView
+
+from .jobs import get_job, submit_prediction
+from .models import is_company_code
+from .registry import get_predictor, predict_cached
+from .views import parse_batch_codes, stream_chunk, stream_head, stream_tail
+
+_get_predictor = sync_to_async(get_predictor, thread_sensitive=False)
+_predict_cached = sync_to_async(predict_cached, thread_sensitive=False)
+
+
+async def _predict_many(predictor, codes):
+    return await sync_to_async(predictor.predict_many, thread_sensitive=False)(codes)
+
+
+class PredictionAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        try:
+            company_code = request.data.get('company_code')
+            if not company_code:
+                return Response({
+                    'status': 'error',
+                    'message': '請提供股票代碼'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # 快取沒有時才讀預先算好的結果，再沒有才即時計算
+            predictions = await _predict_cached(company_code)
+
+            if predictions is None:
+                return Response({
+                    'status': 'error',
+                    'message': '預測過程發生錯誤'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            return Response({
+                'status': 'success',
+                'company_code': company_code,
+                'predictions': predictions
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class BatchPredictionAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        try:
+            codes, error = await sync_to_async(parse_batch_codes)(request)
+            if error is not None:
+                return error
+
+            valid = [code for code in codes if is_company_code(code)]
+            invalid = [code for code in codes if not is_company_code(code)]
+            chunk_size = getattr(settings, 'PREDICTION_BATCH_CHUNK_SIZE', 50)
+            predictor = await _get_predictor()
+
+            if len(valid) <= chunk_size:
+                predictions = await _predict_many(predictor, valid)
+                return Response({
+                    'status': 'success',
+                    'count': len(valid),
+                    'invalid': invalid,
+                    'predictions': {code: predictions[int(code)] for code in valid}
+                }, status=status.HTTP_200_OK)
+
+            # 用 async generator 串流，ASGI 不必先把整份結果收齊
+            return StreamingHttpResponse(
+                _stream_predictions(predictor, valid, invalid, chunk_size),
+                content_type='application/json'
+            )
+
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PredictionJobAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        company_code = request.data.get('company_code')
+        if not company_code:
+            return Response({
+                'status': 'error',
+                'message': '請提供股票代碼'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            job = await sync_to_async(submit_prediction)(company_code, request.user)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'status': 'success',
+            'job_id': str(job.id),
+            'job_status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+    async def get(self, request, job_id):
+        job = await sync_to_async(get_job)(job_id, request.user)
+        if job is None:
+            return Response({
+                'status': 'error',
+                'message': '找不到預測工作'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'status': 'success',
+            'job_id': str(job.id),
+            'job_status': job.status,
+            'company_code': job.company_code,
+            'predictions': job.result,
+            'error': job.error or None
+        }, status=status.HTTP_200_OK)
+
+
+async def _stream_predictions(predictor, codes, invalid, chunk_size):
+    # 回應已經開始送出，某一批失敗時那一批輸出 null 並記在 errors，JSON 仍然完整
+    errors = []
+    yield stream_head(codes, invalid)
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        try:
+            text = stream_chunk(chunk, await _predict_many(predictor, chunk), start == 0)
+        except Exception as e:
+            errors.append({'codes': chunk, 'message': str(e)})
+            text = stream_chunk(chunk, None, start == 0)
+        yield text
+    yield stream_tail(errors)
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class _Call:
+    """正在計算中的一個 key，其他同 key 的請求等它算完"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PredictionCache:
+    """預測結果快取：LRU 淘汰、TTL 過期，同一個 key 同時只算一次（single-flight）
+
+    key 內含資料版本（snapshot），資料或模型更新後舊的結果自然不會再被讀到，
+    看到新版本時也會把舊版本的項目全部清掉。
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_compute(self, company_code, snapshot, compute):
+        key = (company_code, snapshot)
+        with self._lock:
+            if snapshot != self._snapshot:
+                self._entries.clear()
+                self._snapshot = snapshot
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return dict(call.value) if call.value is not None else None
+
+        try:
+            call.value = compute()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if call.value is not None and snapshot == self._snapshot:
+                    self._entries[key] = (time.monotonic() + self.ttl, call.value)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            call.event.set()
+
+        return dict(call.value) if call.value is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+prediction_cache = PredictionCache(
+    max_entries=getattr(settings, 'PREDICTION_CACHE_MAX_ENTRIES', 1024),
+    ttl=getattr(settings, 'PREDICTION_CACHE_TTL', 3600),
+)
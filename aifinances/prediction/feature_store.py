@@ -0,0 +1,288 @@
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+DAYS = ['Day1', 'Day2', 'Day3', 'Day4', 'Day5']
+STORE_VERSION = 2
+CODE_COLUMN = 'Company Code'
+# y_test_raw.csv 的標籤，與 X_test_raw.csv 同列對齊
+LABEL_COLUMN = 'y_test'
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.npz'
+
+
+def get_data_dir():
+    return getattr(
+        settings,
+        'PREDICTION_DATA_DIR',
+        os.path.join(settings.BASE_DIR, 'prediction', 'data_splits'),
+    )
+
+
+def get_store_dir():
+    return getattr(
+        settings,
+        'PREDICTION_FEATURE_STORE_DIR',
+        os.path.join(settings.BASE_DIR, 'prediction', 'feature_store'),
+    )
+
+
+def detect_encoding(path):
+    """判斷 CSV 標頭的編碼，中文欄名可能是 Big5"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+    for encoding in ('utf-8-sig', 'big5', 'cp950'):
+        try:
+            header.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'utf-8'
+
+
+def _downcast(chunk):
+    """Company Code 轉 int32，數值欄位轉 float32，其餘欄位存成字串"""
+    columns = {}
+    for name in chunk.columns:
+        if name == CODE_COLUMN:
+            columns[name] = chunk[name].to_numpy(dtype=np.int32)
+        elif chunk[name].dtype.kind in 'iufb':
+            columns[name] = chunk[name].to_numpy(dtype=np.float32)
+        else:
+            columns[name] = chunk[name].astype(str).to_numpy(dtype=object)
+    return columns
+
+
+def _read_labels(y_path, rows, chunksize):
+    if not os.path.exists(y_path):
+        return None
+    parts = [
+        chunk.iloc[:, 0].to_numpy(dtype=np.int8)
+        for chunk in pd.read_csv(y_path, header=None, chunksize=chunksize)
+    ]
+    labels = np.concatenate(parts) if parts else np.empty(0, dtype=np.int8)
+    return labels if len(labels) == rows else None
+
+
+def _read_text_column(path):
+    """讀回 build_day 逐塊 np.save 的文字欄位，接成一個陣列"""
+    size = os.path.getsize(path)
+    parts = []
+    with open(path, 'rb') as f:
+        while f.tell() < size:
+            parts.append(np.load(f))
+    return np.concatenate(parts) if parts else np.empty(0, dtype=str)
+
+
+def build_day(csv_path, out_dir, chunksize=100000):
+    """分塊讀取單一天的 X_test_raw.csv，縮小型別後依 Company Code 排序寫成欄式格式
+
+    第一輪逐塊把每個欄位附加到暫存檔（數值欄位是原始二進位，文字欄位是逐塊的
+    np.save），記憶體只放一個 chunk；第二輪依公司代碼排序，一次只載入一個欄位
+    重新排列後寫出。
+    """
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    names = None
+    dtypes = {}
+    raw_files = {}
+    text_files = {}
+    rows = 0
+    encoding = detect_encoding(csv_path)
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, encoding=encoding):
+            if names is None:
+                names = [str(name).strip() for name in chunk.columns]
+                if CODE_COLUMN not in names:
+                    raise ValueError(f"{csv_path} 缺少 {CODE_COLUMN} 欄位")
+            chunk.columns = names
+
+            for i, (name, values) in enumerate(_downcast(chunk).items()):
+                # 欄位型別以第一次出現時為準，之後的 chunk 跟著轉換
+                if name in text_files or (values.dtype == object and name not in raw_files):
+                    if name not in text_files:
+                        text_files[name] = open(os.path.join(tmp_dir, f"text_{i:04d}.bin"), 'wb')
+                    np.save(text_files[name], values.astype(str), allow_pickle=False)
+                    continue
+                if values.dtype == object:
+                    values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float32)
+                if name not in raw_files:
+                    raw_files[name] = open(os.path.join(tmp_dir, f"raw_{i:04d}.bin"), 'wb')
+                    dtypes[name] = values.dtype
+                values.astype(dtypes[name], copy=False).tofile(raw_files[name])
+            rows += len(chunk)
+    finally:
+        for f in [*raw_files.values(), *text_files.values()]:
+            f.close()
+
+    if names is None:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise ValueError(f"{csv_path} 沒有資料")
+
+    # 依公司代碼排序，讓同一家公司的資料連續存放，查詢時只要切片
+    codes = np.fromfile(raw_files[CODE_COLUMN].name, dtype=np.int32)
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    unique_codes, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+    del codes
+
+    labels = _read_labels(os.path.join(os.path.dirname(csv_path), 'y_test_raw.csv'), rows, chunksize)
+    columns = []
+    for i, name in enumerate(names + ([LABEL_COLUMN] if labels is not None else [])):
+        if name == LABEL_COLUMN and labels is not None:
+            values = labels[order]
+        elif name in text_files:
+            text_path = text_files[name].name
+            values = _read_text_column(text_path)[order]
+            os.remove(text_path)
+        else:
+            raw_path = raw_files[name].name
+            values = np.fromfile(raw_path, dtype=dtypes[name])[order]
+            os.remove(raw_path)
+        filename = f"col_{i:04d}.npy"
+        np.save(os.path.join(tmp_dir, filename), values)
+        columns.append({'name': name, 'file': filename, 'dtype': values.dtype.str})
+        del values
+
+    np.savez(
+        os.path.join(tmp_dir, INDEX_FILE),
+        codes=unique_codes.astype(np.int64),
+        starts=starts.astype(np.int64),
+        counts=counts.astype(np.int64),
+    )
+
+    stat = os.stat(csv_path)
+    meta = {
+        'version': STORE_VERSION,
+        'rows': int(rows),
+        'columns': columns,
+        'source': {'size': stat.st_size, 'mtime': stat.st_mtime, 'encoding': encoding},
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # 先寫到暫存目錄再整個換上去，避免讀到寫一半的資料
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return meta
+
+
+def build_store(data_dir=None, store_dir=None, days=None, chunksize=100000):
+    """把 Day1~Day5 的測試資料全部轉成特徵庫，回傳每天的建置結果"""
+    data_dir = data_dir or get_data_dir()
+    store_dir = store_dir or get_store_dir()
+    os.makedirs(store_dir, exist_ok=True)
+
+    results = {}
+    for day in days or DAYS:
+        csv_path = os.path.join(data_dir, day, 'X_test_raw.csv')
+        if not os.path.exists(csv_path):
+            results[day] = None
+            continue
+        results[day] = build_day(csv_path, os.path.join(store_dir, day), chunksize)
+    return results
+
+
+class DayTable:
+    """單一天的欄式資料，欄位以 mmap 方式唯讀載入"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"特徵庫版本不符: {path}")
+
+        self.columns = {
+            col['name']: np.load(os.path.join(path, col['file']), mmap_mode='r')
+            for col in self.meta['columns']
+        }
+        with np.load(os.path.join(path, INDEX_FILE)) as index:
+            codes = index['codes'].tolist()
+            starts = index['starts'].tolist()
+            counts = index['counts'].tolist()
+        # 公司代碼 -> (起始列, 結束列)，查詢是一次 dict 存取
+        self.index = {code: (start, start + count) for code, start, count in zip(codes, starts, counts)}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def memory_usage(self):
+        """回傳 mmap 欄位大小與常駐索引的估計大小（bytes）"""
+        mapped = sum(col.nbytes for col in self.columns.values())
+        # dict entry + 兩個 int tuple 的粗估
+        index = sys.getsizeof(self.index) + len(self.index) * 120
+        return {'mapped_bytes': int(mapped), 'index_bytes': int(index)}
+
+    def rows(self, company_code):
+        span = self.index.get(int(company_code))
+        if span is None:
+            return None
+        start, stop = span
+        return pd.DataFrame({name: np.asarray(col[start:stop]) for name, col in self.columns.items()})
+
+    def codes(self):
+        return list(self.index)
+
+    def first_rows(self, company_codes=None):
+        """取出每家公司的第一列，company_codes 為 None 時回傳全部公司"""
+        if company_codes is None:
+            company_codes = self.codes()
+        positions = [
+            self.index[code][0]
+            for code in (int(c) for c in company_codes)
+            if code in self.index
+        ]
+        positions = np.asarray(positions, dtype=np.int64)
+        return pd.DataFrame({name: col[positions] for name, col in self.columns.items()})
+
+
+class FeatureStore:
+    """讀取 build_store 產生的特徵庫，一次查詢取得某公司五天的資料"""
+
+    def __init__(self, store_dir=None, days=None):
+        self.store_dir = store_dir or get_store_dir()
+        self.days = days or DAYS
+        self._tables = {}
+
+    def has_day(self, day):
+        return os.path.exists(self.meta_path(day))
+
+    def is_available(self):
+        return all(self.has_day(day) for day in self.days)
+
+    def meta_path(self, day):
+        return os.path.join(self.store_dir, day, META_FILE)
+
+    def load(self):
+        """一次把所有天的資料表與索引載入常駐"""
+        for day in self.days:
+            self.table(day)
+        return self
+
+    def memory_usage(self):
+        return {
+            day: table.memory_usage()
+            for day, table in self._tables.items()
+            if table is not None
+        }
+
+    def table(self, day):
+        if day not in self._tables:
+            self._tables[day] = DayTable(os.path.join(self.store_dir, day)) if self.has_day(day) else None
+        return self._tables[day]
+
+    def lookup(self, company_code):
+        """回傳 {day: DataFrame 或 None}"""
+        features = {}
+        for day in self.days:
+            table = self.table(day)
+            features[day] = table.rows(company_code) if table is not None else None
+        return features
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from django.conf import settings
+
+from .feature_store import CODE_COLUMN, DAYS
+
+LFS_POINTER_PREFIX = b'version https://git-lfs'
+
+
+def get_models_dir():
+    return getattr(
+        settings,
+        'PREDICTION_MODELS_DIR',
+        os.path.join(settings.BASE_DIR, 'prediction', 'saved_models'),
+    )
+
+
+def read_feature_list(path):
+    """讀取 selected_features_DayN.txt，檔案目前是 Big5 編碼，也接受 UTF-8"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    for encoding in ('utf-8-sig', 'big5', 'cp950'):
+        try:
+            text = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError(f"無法解碼特徵清單: {path}")
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _is_lfs_pointer(path):
+    with open(path, 'rb') as f:
+        return f.read(len(LFS_POINTER_PREFIX)) == LFS_POINTER_PREFIX
+
+
+def _current_rss():
+    """目前 process 的常駐記憶體（bytes），非 Linux 時回傳 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def convert_model(pickle_path, booster_path):
+    """把 joblib pickle 的模型轉成 XGBoost 原生 UBJSON 格式，寫完再換上避免讀到一半的檔案"""
+    model = joblib.load(pickle_path)
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    # save_model 依副檔名決定格式，暫存檔也要是 .ubj
+    tmp_path = f"{booster_path[:-len('.ubj')]}.tmp-{os.getpid()}.ubj"
+    try:
+        booster.save_model(tmp_path)
+        os.replace(tmp_path, booster_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return booster
+
+
+def _strip_prefix(name):
+    # ColumnTransformer 的輸出欄名是 "num__欄位"，只保留原始欄位名稱
+    return name.split('__', 1)[1] if '__' in name else name
+
+
+class DayModel:
+    """單一天的前處理器、booster 與特徵清單"""
+
+    def __init__(self, day, preprocessor, booster, features, load_seconds, size_bytes,
+                 source='pickle', rss_bytes=None):
+        self.day = day
+        self.preprocessor = preprocessor
+        self.booster = booster
+        self.features = features
+        self.load_seconds = load_seconds
+        self.size_bytes = size_bytes
+        self.source = source
+        self.rss_bytes = rss_bytes
+
+    def prepare(self, frame):
+        """把原始特徵轉成模型輸入的矩陣（欄位順序依 booster 訓練時的特徵）"""
+        X = frame
+        if self.preprocessor is not None:
+            columns = list(getattr(self.preprocessor, 'feature_names_in_', self.features))
+            transformed = self.preprocessor.transform(frame[columns])
+            if hasattr(self.preprocessor, 'get_feature_names_out'):
+                names = [_strip_prefix(name) for name in self.preprocessor.get_feature_names_out()]
+            else:
+                names = columns
+            X = pd.DataFrame(transformed, columns=names, index=frame.index)
+            # 前處理沒有輸出的欄位（例如 Company Code）直接用原始值
+            for name in self.features:
+                if name not in X.columns and name in frame.columns:
+                    X[name] = frame[name]
+
+        return X[self.features].to_numpy(dtype=np.float32)
+
+    def predict(self, frame):
+        """一次對多列資料做預測，回傳每列一個值
+
+        回歸模型直接回傳預測值；multi:softprob 分類模型回傳機率最高的類別標籤
+        （和 multi:softmax 的輸出相同），各類別的機率另外用 predict_proba 取得。
+        類別不一定有順序或等距，所以不對機率做加權平均。
+        """
+        output = self.booster.predict(self._matrix(frame))
+        if output.ndim == 2:
+            output = output.argmax(axis=1)
+        return output.astype(float)
+
+    def predict_proba(self, frame):
+        """分類模型每列各類別的機率（rows x classes），回歸模型回傳 None"""
+        output = self.booster.predict(self._matrix(frame))
+        return output.astype(float) if output.ndim == 2 else None
+
+    def _matrix(self, frame):
+        return xgb.DMatrix(self.prepare(frame), feature_names=self.features)
+
+
+class InferenceEngine:
+    """載入 saved_models/DayN 的模型，每天只載入一次，之後批次預測
+
+    有 manage.py convert_models 產生的 XGBoost_model.ubj 時優先讀取原生格式，
+    不必經過 pickle；沒有時才退回 XGBoost_model.pkl。
+    """
+
+    def __init__(self, models_dir=None, days=None):
+        self.models_dir = models_dir or get_models_dir()
+        self.days = days or DAYS
+        self._models = {}
+        self._available = {}
+        self._lock = threading.Lock()
+
+    def paths(self, day):
+        day_dir = os.path.join(self.models_dir, day)
+        return {
+            'model': os.path.join(day_dir, 'XGBoost_model.pkl'),
+            'booster': os.path.join(day_dir, 'XGBoost_model.ubj'),
+            'preprocessor': os.path.join(day_dir, f'preprocessor_{day}.pkl'),
+            'features': os.path.join(day_dir, f'selected_features_{day}.txt'),
+        }
+
+    def has_model(self, day):
+        """模型檔存在且不是還沒下載的 Git LFS 指標檔"""
+        if day not in self._available:
+            paths = self.paths(day)
+            self._available[day] = os.path.exists(paths['features']) and (
+                os.path.exists(paths['booster'])
+                or (os.path.exists(paths['model']) and not _is_lfs_pointer(paths['model']))
+            )
+        return self._available[day]
+
+    def load(self, day):
+        if day in self._models:
+            return self._models[day]
+
+        with self._lock:
+            if day not in self._models:
+                self._models[day] = self._load(day)
+        return self._models[day]
+
+    def preload(self):
+        """一次載入所有有模型檔的天數；在 fork worker 之前呼叫，子 process 可共用同一份記憶體"""
+        for day in self.days:
+            if self.has_model(day):
+                self.load(day)
+        return self.memory_usage()
+
+    def _load(self, day):
+        paths = self.paths(day)
+        rss_before = _current_rss()
+        started = time.perf_counter()
+
+        if os.path.exists(paths['booster']):
+            booster = xgb.Booster(model_file=paths['booster'])
+            source, model_path = 'ubj', paths['booster']
+        else:
+            model = joblib.load(paths['model'])
+            booster = model.get_booster() if hasattr(model, 'get_booster') else model
+            source, model_path = 'pickle', paths['model']
+
+        preprocessor = None
+        if os.path.exists(paths['preprocessor']) and not _is_lfs_pointer(paths['preprocessor']):
+            preprocessor = joblib.load(paths['preprocessor'])
+
+        features = booster.feature_names or read_feature_list(paths['features'])
+        rss_after = _current_rss()
+        return DayModel(
+            day,
+            preprocessor,
+            booster,
+            list(features),
+            time.perf_counter() - started,
+            os.path.getsize(model_path),
+            source=source,
+            rss_bytes=rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        )
+
+    def predict(self, day, frame):
+        """對同一天的多家公司做一次向量化預測，回傳 {公司代碼: 預測值}"""
+        if frame is None or frame.empty:
+            return {}
+        rows = frame.drop_duplicates(CODE_COLUMN, keep='first')
+        values = self.load(day).predict(rows)
+        return dict(zip(rows[CODE_COLUMN].astype(int).tolist(), values.tolist()))
+
+    def predict_batch(self, day_frames):
+        """day_frames 為 {day: DataFrame}，每天只呼叫一次 booster"""
+        return {day: self.predict(day, frame) for day, frame in day_frames.items()}
+
+    def memory_usage(self):
+        return {
+            day: {
+                'source': model.source,
+                'size_bytes': model.size_bytes,
+                'rss_bytes': model.rss_bytes,
+                'load_seconds': model.load_seconds,
+            }
+            for day, model in self._models.items()
+        }
+
+    def signature_paths(self):
+        return [path for day in self.days for path in self.paths(day).values()]
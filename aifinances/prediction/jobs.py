@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from aifinances.pools import WorkerProcessPool
+
+from .models import PrecomputedPrediction, PredictionJob, normalize_company_code
+from .registry import get_predictor
+
+_submit_lock = threading.Lock()
+
+
+def _job_timeout():
+    return getattr(settings, 'PREDICTION_JOB_TIMEOUT', 120)
+
+
+def _job_workers():
+    return getattr(settings, 'PREDICTION_JOB_WORKERS', 2)
+
+
+# 每個 worker process 一個 process pool，在第一次送出工作時建立
+pool = WorkerProcessPool(_job_workers)
+
+
+def _run_prediction(company_code):
+    # 在子 process 執行，fork 時已載入的特徵庫會直接沿用
+    return get_predictor().predict(company_code)
+
+
+def _finish(job_id, executor, future):
+    """工作結束後把結果寫回資料庫（在 executor 的管理執行緒執行）"""
+    close_old_connections()
+    try:
+        try:
+            predictions = future.result()
+        except BrokenProcessPool:
+            # 子 process 被 OOM killer 等原因中止，下次送出工作時重新建立
+            pool.reset(executor)
+            raise
+        if predictions is None:
+            PredictionJob.objects.filter(pk=job_id).update(
+                status=PredictionJob.FAILED, error='預測過程發生錯誤', updated_at=timezone.now()
+            )
+        else:
+            PredictionJob.objects.filter(pk=job_id).update(
+                status=PredictionJob.DONE, result=predictions, updated_at=timezone.now()
+            )
+    except Exception as e:
+        PredictionJob.objects.filter(pk=job_id).update(
+            status=PredictionJob.FAILED, error=str(e), updated_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def submit_prediction(company_code, user):
+    """替 user 建立預測工作並回傳 PredictionJob；該使用者同一檔股票已有進行中的工作時直接回傳那一個
+
+    去重用的是 process 內的鎖：同一個 worker 內同時送出的請求只會建立一個工作，
+    但不同 worker（或不同主機）同時送出同一檔股票時，仍可能各自建立一個工作。
+    """
+    company_code = normalize_company_code(company_code)
+    snapshot = get_predictor().snapshot
+
+    with _submit_lock:
+        inflight = (
+            PredictionJob.objects.filter(
+                user=user,
+                company_code=company_code,
+                snapshot=snapshot,
+                status=PredictionJob.PENDING,
+                created_at__gte=timezone.now() - timedelta(seconds=_job_timeout()),
+            )
+            .order_by('-created_at')
+            .first()
+        )
+        if inflight is not None:
+            return inflight
+
+        # 已經預先算好的結果不必再排隊
+        predictions = PrecomputedPrediction.lookup(snapshot, company_code)
+        if predictions is not None:
+            return PredictionJob.objects.create(
+                user=user,
+                company_code=company_code,
+                snapshot=snapshot,
+                status=PredictionJob.DONE,
+                result=predictions,
+            )
+
+        job = PredictionJob.objects.create(user=user, company_code=company_code, snapshot=snapshot)
+        executor = pool.get()
+        try:
+            future = executor.submit(_run_prediction, company_code)
+        except BrokenProcessPool:
+            pool.reset(executor)
+            executor = pool.get()
+            future = executor.submit(_run_prediction, company_code)
+        future.add_done_callback(partial(_finish, job.pk, executor))
+        return job
+
+
+def get_job(job_id, user):
+    """取得 user 自己的工作狀態，超過逾時仍未完成的工作標記為失敗
+
+    別人的工作與不存在的工作一樣回傳 None，不透露該 job id 是否存在。
+    """
+    job = PredictionJob.objects.filter(pk=job_id, user=user).first()
+    if job is None:
+        return None
+
+    expired = job.created_at < timezone.now() - timedelta(seconds=_job_timeout())
+    if job.status == PredictionJob.PENDING and expired:
+        job.status = PredictionJob.FAILED
+        job.error = '預測逾時'
+        job.save(update_fields=['status', 'error', 'updated_at'])
+    return job
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from prediction.feature_store import DAYS, build_store, get_data_dir, get_store_dir
+
+
+class Command(BaseCommand):
+    help = '把 data_splits/DayN/X_test_raw.csv 轉成依公司代碼索引的欄式特徵庫'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', default=None, help='data_splits 目錄')
+        parser.add_argument('--store-dir', default=None, help='特徵庫輸出目錄')
+        parser.add_argument('--days', nargs='*', choices=DAYS, default=None)
+        parser.add_argument(
+            '--chunksize', type=int, default=100000,
+            help='每次讀入的列數，決定建置時的記憶體上限'
+        )
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir'] or get_data_dir()
+        store_dir = options['store_dir'] or get_store_dir()
+        results = build_store(data_dir, store_dir, options['days'], options['chunksize'])
+
+        for day, meta in results.items():
+            if meta is None:
+                self.stdout.write(self.style.WARNING(f"{day}: 找不到 X_test_raw.csv，略過"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{day}: {meta['rows']} 筆, {len(meta['columns'])} 欄 ({meta['source']['encoding']})"
+                ))
+        self.stdout.write(f"特徵庫位置: {store_dir}")
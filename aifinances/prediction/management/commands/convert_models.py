@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from prediction.feature_store import DAYS
+from prediction.inference import InferenceEngine, _is_lfs_pointer, convert_model, get_models_dir
+
+
+class Command(BaseCommand):
+    help = '把 saved_models/DayN/XGBoost_model.pkl 轉成 XGBoost 原生 UBJSON 格式，並回報載入時間與記憶體'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models-dir', default=None, help='saved_models 目錄')
+        parser.add_argument('--days', nargs='*', choices=DAYS, default=None)
+        parser.add_argument('--force', action='store_true', help='已轉換過也重新轉換')
+
+    def handle(self, *args, **options):
+        models_dir = options['models_dir'] or get_models_dir()
+        days = options['days'] or DAYS
+        engine = InferenceEngine(models_dir=models_dir, days=days)
+
+        for day in days:
+            paths = engine.paths(day)
+            pickle_path, booster_path = paths['model'], paths['booster']
+            if not os.path.exists(pickle_path) or _is_lfs_pointer(pickle_path):
+                self.stdout.write(self.style.WARNING(f"{day}: 找不到模型檔或尚未下載 LFS，略過"))
+                continue
+
+            fresh = (
+                os.path.exists(booster_path)
+                and os.path.getmtime(booster_path) >= os.path.getmtime(pickle_path)
+            )
+            if options['force'] or not fresh:
+                convert_model(pickle_path, booster_path)
+
+            # 用轉換後的檔案實際載入一次，確認可以讀取並回報成本
+            model = engine.load(day)
+            rss = f"{model.rss_bytes / 1024 / 1024:.1f} MB" if model.rss_bytes is not None else '未知'
+            self.stdout.write(self.style.SUCCESS(
+                f"{day}: pkl {os.path.getsize(pickle_path) / 1024 / 1024:.1f} MB -> "
+                f"ubj {model.size_bytes / 1024 / 1024:.1f} MB, "
+                f"載入 {model.load_seconds * 1000:.0f} ms, 常駐記憶體 +{rss}"
+            ))
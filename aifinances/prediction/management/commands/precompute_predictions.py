@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from prediction.models import PrecomputedPrediction, StockPredictor
+
+
+class Command(BaseCommand):
+    help = '對 data_splits 內所有公司預先計算 Day1~Day5 的預測並寫入資料庫'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help='保留舊版本資料的預測結果（預設會刪除）'
+        )
+
+    def handle(self, *args, **options):
+        predictor = StockPredictor().load()
+        snapshot = predictor.snapshot
+        results = predictor.predict_universe()
+
+        rows = [
+            PrecomputedPrediction(
+                snapshot=snapshot,
+                company_code=str(code),
+                predictions=predictions,
+            )
+            for code, predictions in results.items()
+        ]
+
+        with transaction.atomic():
+            PrecomputedPrediction.objects.filter(snapshot=snapshot).delete()
+            PrecomputedPrediction.objects.bulk_create(rows, batch_size=options['batch_size'])
+            if not options['keep_old']:
+                PrecomputedPrediction.objects.exclude(snapshot=snapshot).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"已寫入 {len(rows)} 家公司的預測 (snapshot {snapshot})"
+        ))
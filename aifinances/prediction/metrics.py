@@ -0,0 +1,67 @@
+from aifinances.metrics import Counter, Gauge, Histogram
+
+from .cache import prediction_cache
+
+FEATURE_LOOKUP_SECONDS = Histogram(
+    'prediction_feature_lookup_seconds',
+    '單一天取得公司特徵的時間（store 為特徵庫查詢，csv 為逐塊掃描 CSV）',
+    ['day', 'source'],
+)
+INFERENCE_SECONDS = Histogram(
+    'prediction_inference_seconds',
+    '單一天模型預測的時間（fallback 為沒有模型時讀 Future_Price_Change）',
+    ['day', 'source'],
+)
+PREDICT_SECONDS = Histogram(
+    'prediction_predict_seconds',
+    'StockPredictor 一次預測（五天合計）的時間',
+    ['operation'],
+)
+DAY_ERRORS = Counter(
+    'prediction_day_errors_total',
+    '單一天處理失敗的次數',
+    ['day'],
+)
+
+
+def _cache_stat(name):
+    return lambda: prediction_cache.stats()[name]
+
+
+def _model_usage(field):
+    def collect():
+        # 只讀已載入的 predictor，抓取 /metrics 不會觸發載入
+        from .registry import memory_usage
+        usage = memory_usage().get('models', {})
+        return {(day,): model[field] for day, model in usage.items() if model.get(field) is not None}
+    return collect
+
+
+def _feature_store_bytes():
+    from .registry import memory_usage
+    usage = memory_usage().get('feature_store', {})
+    return {(day,): table['mapped_bytes'] + table['index_bytes'] for day, table in usage.items()}
+
+
+CACHE_HITS = Counter('prediction_cache_hits_total', '預測快取命中次數', function=_cache_stat('hits'))
+CACHE_MISSES = Counter('prediction_cache_misses_total', '預測快取未命中次數', function=_cache_stat('misses'))
+CACHE_COALESCED = Counter(
+    'prediction_cache_coalesced_total', '等待同一個 key 計算結果的請求數', function=_cache_stat('coalesced')
+)
+CACHE_EVICTIONS = Counter(
+    'prediction_cache_evictions_total', '預測快取 LRU 淘汰次數', function=_cache_stat('evictions')
+)
+CACHE_SIZE = Gauge('prediction_cache_entries', '預測快取目前的項目數', function=_cache_stat('size'))
+
+MODEL_SIZE_BYTES = Gauge(
+    'prediction_model_size_bytes', '已載入模型檔的大小', ['day'], function=_model_usage('size_bytes')
+)
+MODEL_RSS_BYTES = Gauge(
+    'prediction_model_resident_bytes', '載入模型時增加的常駐記憶體', ['day'], function=_model_usage('rss_bytes')
+)
+MODEL_LOAD_SECONDS = Gauge(
+    'prediction_model_load_seconds', '載入模型花費的時間', ['day'], function=_model_usage('load_seconds')
+)
+FEATURE_STORE_BYTES = Gauge(
+    'prediction_feature_store_bytes', '特徵庫 mmap 與索引的大小', ['day'], function=_feature_store_bytes
+)
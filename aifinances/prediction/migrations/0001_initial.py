@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-18 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecomputedPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot', models.CharField(max_length=32)),
+                ('company_code', models.CharField(max_length=10)),
+                ('predictions', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('snapshot', 'company_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-18 08:09
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('company_code', models.CharField(max_length=10)),
+                ('snapshot', models.CharField(max_length=32)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company_code', 'snapshot', 'status'], name='prediction_job_lookup_idx')],
+            },
+        ),
+    ]
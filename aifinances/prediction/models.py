@@ -1,90 +1,434 @@
 import pandas as pd
 import os
+import functools
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from django.conf import settings
-import gc
+from django.db import models
+from aifinances import profiling
+from .feature_store import FeatureStore, detect_encoding, get_data_dir
+from .inference import InferenceEngine
+from .metrics import DAY_ERRORS, FEATURE_LOOKUP_SECONDS, INFERENCE_SECONDS, PREDICT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 該天沒有資料，預測結果中不列出這一天
+_MISSING = object()
+
+
+@functools.lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size):
+    """整個檔案的 SHA-1，以 (路徑, 修改時間, 大小) 快取，檔案沒變就不重讀"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def get_digest_cache_path():
+    return getattr(
+        settings,
+        'PREDICTION_DIGEST_CACHE_PATH',
+        os.path.join(tempfile.gettempdir(), 'aifinances', 'file_digests.json'),
+    )
+
+
+def _read_digest_cache(path):
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def _write_digest_cache(path, entries):
+    """先寫暫存檔再 os.replace；寫不進去只是下次重新計算，不影響載入"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        logger.warning("Cannot write digest cache %s", path, exc_info=True)
+
+
+def is_company_code(company_code):
+    """只接受 ASCII 數字；str.isdigit() 連 "²"、全形數字都算，int() 卻不一定轉得過去"""
+    return company_code.isascii() and company_code.isdigit()
+
+
+def normalize_company_code(company_code):
+    """去掉空白與開頭的 0，"2330"、" 2330"、"02330" 都視為同一檔股票"""
+    company_code = str(company_code).strip()
+    return str(int(company_code)) if is_company_code(company_code) else company_code
+
 
 class StockPredictor:
     def __init__(self):
         self.days = ['Day1', 'Day2', 'Day3', 'Day4', 'Day5']
-        self.data_dir = os.path.join(settings.BASE_DIR, 'prediction', 'data_splits')
-        print(f"Data directory: {self.data_dir}")
+        self.data_dir = get_data_dir()
+        self.feature_store = FeatureStore(days=self.days)
+        self.engine = InferenceEngine(days=self.days)
+        self._signature = None
+        self.snapshot = None
+        self.max_workers = getattr(settings, 'PREDICTION_DAY_WORKERS', len(self.days))
+        self.executor_kind = getattr(settings, 'PREDICTION_DAY_EXECUTOR', 'thread')
+        self._thread_pool = None
+        self._process_pool = None
+        self._pool_pid = None
+        self._local = threading.local()
 
-    def get_features(self, company_code):
-        """從測試資料中獲取原始特徵"""
-        try:
-            features = {}
-            for day in self.days:
-                x_test_path = os.path.join(self.data_dir, day, 'X_test_raw.csv')
-                if not os.path.exists(x_test_path):
-                    print(f"Warning: Test data not found at {x_test_path}")
-                    continue
-                
-                try:
-                    # 首先只讀取Company Code列
-                    df_iterator = pd.read_csv(x_test_path, chunksize=1000)
-                    found = False
-                    for chunk in df_iterator:
-                        if int(company_code) in chunk['Company Code'].values:
-                            stock_data = chunk[chunk['Company Code'] == int(company_code)].copy()
-                            features[day] = stock_data
-                            found = True
-                            break
-                        del chunk
-                        gc.collect()
-                    
-                    if not found:
-                        print(f"Warning: Company code {company_code} not found in {day} test data")
-                        features[day] = None
-                    
-                except Exception as e:
-                    print(f"Error reading CSV for {day}: {str(e)}")
-                    features[day] = None
-                    
-            return features
-            
-        except Exception as e:
-            print(f"Error getting features for {company_code}: {str(e)}")
+    def load(self):
+        """載入特徵庫並記錄目前檔案版本，重新載入時整個換掉舊的資料"""
+        feature_store = FeatureStore(days=self.days)
+        if feature_store.is_available():
+            feature_store.load()
+        self.feature_store = feature_store
+        # 換新的 engine，模型在第一次預測時載入後常駐
+        self.engine = InferenceEngine(days=self.days)
+        self._signature = self.data_signature()
+        self.snapshot = self.snapshot_version()
+        return self
+
+    def data_signature(self):
+        """特徵庫、CSV 與模型檔的修改時間與大小，用來判斷是否需要重新載入"""
+        paths = [self.feature_store.meta_path(day) for day in self.days]
+        paths += [os.path.join(self.data_dir, day, 'X_test_raw.csv') for day in self.days]
+        paths += self.engine.signature_paths()
+
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def snapshot_version(self):
+        """資料與模型的版本號，以檔案完整內容計算，複製到其他主機也不會改變
+
+        檔案中間的內容改了、大小不變時版本號也會改變。每個檔案的雜湊以 (路徑, 大小, 修改時間)
+        記在 PREDICTION_DIGEST_CACHE_PATH，同一台主機上的其他 worker 與重新啟動的 process
+        直接沿用，只有修改過的檔案需要重新讀過一次。
+        """
+        cache_path = get_digest_cache_path()
+        cached = _read_digest_cache(cache_path)
+        entries = {}
+
+        digest = hashlib.sha1()
+        for path, mtime_ns, size in self._signature or self.data_signature():
+            if size is None:
+                continue
+            key = f"{os.path.abspath(path)}:{size}:{mtime_ns}"
+            entries[key] = cached.get(key) or _file_digest(path, mtime_ns, size).hex()
+            digest.update(f"{os.path.relpath(path, settings.BASE_DIR)}:{size}:".encode())
+            digest.update(bytes.fromhex(entries[key]))
+
+        # 只保留目前檔案的雜湊，舊版本的記錄不會一直累積
+        if entries != cached:
+            _write_digest_cache(cache_path, entries)
+        return digest.hexdigest()[:16]
+
+    def reload_if_changed(self):
+        if self.data_signature() == self._signature:
+            return False
+        self.load()
+        return True
+
+    def memory_usage(self):
+        """回傳常駐資料的記憶體用量（bytes）"""
+        feature_store = self.feature_store.memory_usage()
+        models = self.engine.memory_usage()
+        return {
+            'feature_store': feature_store,
+            'models': models,
+            'total_bytes': sum(
+                usage['mapped_bytes'] + usage['index_bytes']
+                for usage in feature_store.values()
+            ) + sum(usage['size_bytes'] for usage in models.values()),
+        }
+
+    def _pool(self):
+        """每天的工作用的執行緒池；fork 後的子 process 要重新建立"""
+        if self._thread_pool is None or self._pool_pid != os.getpid():
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            self._process_pool = None
+            self._pool_pid = os.getpid()
+        return self._thread_pool
+
+    def _parse(self, func, *args):
+        """CSV 解析是 CPU 密集的工作，設定 process 模式時交給 process pool
+
+        只有解析會送到 process pool；score() 仍在呼叫端的執行緒執行，
+        XGBoost 預測時會釋放 GIL，模型也只需要在這個 process 載入一份。
+        """
+        if self.executor_kind != 'process':
+            return func(*args)
+        self._pool()
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._process_pool.submit(func, *args).result()
+
+    def _run_per_day(self, func):
+        """平行對每一天執行 func(day)，回傳 {day: 結果}；單一天失敗時該天為 None，不影響其他天"""
+        timings = {}
+
+        def run(day):
+            started = time.perf_counter()
+            try:
+                return func(day)
+            except Exception:
+                DAY_ERRORS.inc(day=day)
+                logger.exception("Error processing %s", day)
+                return None
+            finally:
+                timings[day] = time.perf_counter() - started
+
+        if self.max_workers <= 1 or profiling.is_active():
+            # profiler 只記得到呼叫它的執行緒，profiling 中的請求改在本執行緒依序執行
+            results = {day: run(day) for day in self.days}
+        else:
+            pool = self._pool()
+            futures = {day: pool.submit(run, day) for day in self.days}
+            results = {day: future.result() for day, future in futures.items()}
+
+        self._local.timings = timings
+        return results
+
+    @property
+    def last_timings(self):
+        """目前執行緒上一次預測每一天花費的秒數"""
+        return dict(getattr(self._local, 'timings', {}))
+
+    def _day_features(self, day, company_code):
+        """取得單一天某公司的資料，有特徵庫時直接用索引查詢，不必掃描 CSV"""
+        table = self.feature_store.table(day)
+        if table is not None:
+            with FEATURE_LOOKUP_SECONDS.time(day=day, source='store'):
+                return table.rows(company_code)
+
+        x_test_path = os.path.join(self.data_dir, day, 'X_test_raw.csv')
+        if not os.path.exists(x_test_path):
+            logger.warning("Test data not found at %s", x_test_path)
             return None
-        finally:
-            gc.collect()
+        with FEATURE_LOOKUP_SECONDS.time(day=day, source='csv'):
+            return self._parse(scan_day_csv, x_test_path, company_code)
+
+    def get_features(self, company_code):
+        """從測試資料中獲取原始特徵，五天平行讀取"""
+        return self._run_per_day(lambda day: self._day_features(day, company_code))
+
+    def score(self, day, frame):
+        """對同一天的多列資料預測，回傳 {公司代碼: 預測值}；沒有模型檔時退回測試資料中的Future_Price_Change值"""
+        if self.engine.has_model(day):
+            with INFERENCE_SECONDS.time(day=day, source='model'):
+                return self.engine.predict(day, frame)
+
+        if 'Future_Price_Change' not in frame.columns:
+            raise KeyError(f"Future_Price_Change column not found in {day} data")
+        with INFERENCE_SECONDS.time(day=day, source='fallback'):
+            rows = frame.drop_duplicates('Company Code', keep='first')
+            return dict(zip(
+                rows['Company Code'].astype(int).tolist(),
+                rows['Future_Price_Change'].astype(float).tolist(),
+            ))
 
     def predict(self, company_code):
-        """直接回傳測試資料中的Future_Price_Change值"""
+        """預測單一公司五天的結果，每一天的讀取與預測平行執行"""
+        started = time.perf_counter()
         try:
-            predictions = {}
-            day_features = self.get_features(company_code)
-            
-            if day_features is None:
-                print("Failed to get features")
-                return None
+            code = int(company_code)
+
+            def predict_day(day):
+                features = self._day_features(day, code)
+                if features is None:
+                    logger.debug("No features available for %s", day)
+                    return _MISSING
+                return self.score(day, features).get(code)
+
+            results = self._run_per_day(predict_day)
+            return {day: value for day, value in results.items() if value is not _MISSING}
 
-            for day in self.days:
-                try:
-                    if day not in day_features or day_features[day] is None:
-                        print(f"No features available for {day}")
-                        continue
-
-                    # 直接獲取Future_Price_Change值
-                    if 'Future_Price_Change' in day_features[day].columns:
-                        predictions[day] = float(day_features[day]['Future_Price_Change'].iloc[0])
-                        print(f"Actual value for {day}: {predictions[day]}")
-                    else:
-                        print(f"Future_Price_Change column not found in {day} data")
-                        predictions[day] = None
-
-                except Exception as e:
-                    print(f"Error getting actual value for {day}: {str(e)}")
-                    predictions[day] = None
-                    continue
-
-            return predictions
-
-        except Exception as e:
-            print(f"Error in getting actual values: {str(e)}")
+        except Exception:
+            logger.exception("Error in prediction for %s", company_code)
             return None
         finally:
-            gc.collect()
+            PREDICT_SECONDS.observe(time.perf_counter() - started, operation='predict')
+
+    def _day_features_many(self, day, codes):
+        table = self.feature_store.table(day)
+        if table is not None:
+            with FEATURE_LOOKUP_SECONDS.time(day=day, source='store'):
+                return table.first_rows(codes)
+
+        x_test_path = os.path.join(self.data_dir, day, 'X_test_raw.csv')
+        if not os.path.exists(x_test_path):
+            return None
+        with FEATURE_LOOKUP_SECONDS.time(day=day, source='csv'):
+            return self._parse(scan_day_csv_many, x_test_path, codes)
+
+    def get_features_many(self, company_codes):
+        """一次取得多家公司的資料，每天只查詢一次，回傳 {day: DataFrame 或 None}"""
+        codes = [int(code) for code in company_codes]
+        return self._run_per_day(lambda day: self._day_features_many(day, codes))
+
+    def predict_many(self, company_codes):
+        """批次預測多家公司，每天只呼叫一次模型，回傳 {公司代碼: {day: 預測值}}
+
+        格式和 predict 相同：某天沒有該公司的資料時不列出那一天，該天處理失敗時為 None。
+        """
+        codes = [int(code) for code in company_codes]
+
+        def predict_day(day):
+            features = self._day_features_many(day, codes)
+            return self.score(day, features) if features is not None else {}
+
+        with PREDICT_SECONDS.time(operation='predict_many'):
+            day_values = self._run_per_day(predict_day)
+        return {
+            code: {
+                day: values.get(code) if values is not None else None
+                for day, values in day_values.items()
+                if values is None or code in values
+            }
+            for code in codes
+        }
+
+    def predict_universe(self):
+        """對特徵庫內所有公司做預測"""
+        codes = set()
+        for day in self.days:
+            table = self.feature_store.table(day)
+            if table is not None:
+                codes.update(table.codes())
+        return self.predict_many(sorted(codes))
+
+
+def scan_chunksize(x_test_path, memory_budget=None):
+    """依記憶體預算（PREDICTION_SCAN_MEMORY_BUDGET）估算每次讀入的列數
+
+    每列的成本抓原始文字長度加上解析後每欄 8 bytes，pandas 解析時文字緩衝與
+    DataFrame 會同時存在，所以再乘二。
+    """
+    if memory_budget is None:
+        memory_budget = getattr(settings, 'PREDICTION_SCAN_MEMORY_BUDGET', 32 * 1024 * 1024)
+    with open(x_test_path, 'rb') as f:
+        header = f.readline()
+        sample = f.read(65536)
+    columns = header.count(b',') + 1
+    line_bytes = len(sample) / max(sample.count(b'\n'), 1)
+    return max(100, int(memory_budget // ((line_bytes + columns * 8) * 2)))
+
+
+def _read_chunks(x_test_path, memory_budget=None, first_chunk=1000):
+    """由小到大逐塊讀入：很快就找到的公司不必解析大塊，要掃完整個檔案時每塊最大到預算上限"""
+    limit = scan_chunksize(x_test_path, memory_budget)
+    size = min(first_chunk, limit)
+    with pd.read_csv(x_test_path, chunksize=size, encoding=detect_encoding(x_test_path)) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(size)
+            except StopIteration:
+                return
+            yield chunk
+            size = min(size * 2, limit)
+
+
+def scan_day_csv(x_test_path, company_code, memory_budget=None):
+    """特徵庫不存在時逐塊掃描單一天的 CSV，只留下該公司的列
+
+    同一時間只有一塊在記憶體中，上一塊在讀下一塊時就會被釋放，不需要手動 gc。
+    """
+    code = int(company_code)
+    for chunk in _read_chunks(x_test_path, memory_budget):
+        # 布林索引本身就是新的 DataFrame，不必再 copy
+        matched = chunk[chunk['Company Code'].to_numpy() == code]
+        if not matched.empty:
+            return matched
+
+    logger.debug("Company code %s not found in %s", company_code, x_test_path)
+    return None
+
+
+def scan_day_csv_many(x_test_path, codes, memory_budget=None):
+    """逐塊用 isin 篩出所有要的公司，全部找到就提早結束"""
+    remaining = set(codes)
+    matches = []
+    for chunk in _read_chunks(x_test_path, memory_budget):
+        matched = chunk[chunk['Company Code'].isin(remaining)]
+        if not matched.empty:
+            matches.append(matched)
+            remaining.difference_update(matched['Company Code'].astype(int).tolist())
+        if not remaining:
+            break
+    return pd.concat(matches, ignore_index=True) if matches else None
+
+
+class PrecomputedPrediction(models.Model):
+    """precompute_predictions 預先算好的預測結果，依資料版本區分"""
+    snapshot = models.CharField(max_length=32)
+    company_code = models.CharField(max_length=10)
+    predictions = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('snapshot', 'company_code')
+
+    def __str__(self):
+        return f"{self.company_code} ({self.snapshot})"
+
+    @classmethod
+    def lookup(cls, snapshot, company_code):
+        """回傳預先算好的五天預測，沒有時回傳 None"""
+        return (
+            cls.objects.filter(snapshot=snapshot, company_code=normalize_company_code(company_code))
+            .values_list('predictions', flat=True)
+            .first()
+        )
+
+
+class PredictionJob(models.Model):
+    """非同步預測工作，POST 建立後由背景 process pool 執行，再用 job id 查詢結果"""
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # 只有建立工作的使用者能查詢結果；舊資料沒有擁有者，任何人都查不到
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='prediction_jobs', null=True
+    )
+    company_code = models.CharField(max_length=10)
+    snapshot = models.CharField(max_length=32)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company_code', 'snapshot', 'status'], name='prediction_job_lookup_idx'),
+        ]
 
-    def __del__(self):
-        """析構函數，確保清理記憶體"""
-        gc.collect()
\ No newline at end of file
+    def __str__(self):
+        return f"{self.company_code} {self.status} ({self.id})"
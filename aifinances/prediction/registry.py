@@ -0,0 +1,66 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import prediction_cache
+from .models import PrecomputedPrediction, StockPredictor, normalize_company_code
+
+_lock = threading.Lock()
+_predictor = None
+_last_check = 0.0
+
+
+def _reload_interval():
+    return getattr(settings, 'PREDICTION_RELOAD_INTERVAL', 30)
+
+
+def get_predictor():
+    """每個 worker process 共用一個已載入資料的 StockPredictor"""
+    global _predictor, _last_check
+
+    if _predictor is None:
+        with _lock:
+            if _predictor is None:
+                _predictor = StockPredictor().load()
+                _last_check = time.monotonic()
+        return _predictor
+
+    # 定期檢查磁碟上的檔案是否更新，有變動就重新載入
+    interval = _reload_interval()
+    if interval is not None and time.monotonic() - _last_check >= interval:
+        with _lock:
+            if time.monotonic() - _last_check >= interval:
+                _last_check = time.monotonic()
+                _predictor.reload_if_changed()
+    return _predictor
+
+
+def reset_predictor():
+    """清掉目前的 predictor，下次呼叫 get_predictor 時重新載入"""
+    global _predictor
+    with _lock:
+        _predictor = None
+
+
+def memory_usage():
+    if _predictor is None:
+        return {'total_bytes': 0}
+    return _predictor.memory_usage()
+
+
+def predict_cached(company_code):
+    """經過預測快取的 predict，同一檔股票同時多個請求只會計算一次"""
+    predictor = get_predictor()
+    company_code = str(company_code).strip()
+    key = normalize_company_code(company_code)
+    snapshot = predictor.snapshot
+
+    def compute():
+        # 預先算好的結果也放在 single-flight 裡面讀，快取命中時完全不碰資料庫
+        predictions = PrecomputedPrediction.lookup(snapshot, key)
+        if predictions is None:
+            predictions = predictor.predict(company_code)
+        return predictions
+
+    return prediction_cache.get_or_compute(key, snapshot, compute)
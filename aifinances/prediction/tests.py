@@ -1,3 +1,719 @@
-from django.test import TestCase
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import pstats
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import jobs, registry
+from . import models as prediction_models
+from .cache import prediction_cache
+from .feature_store import DAYS, DayTable, build_day, build_store
+from .inference import DayModel, InferenceEngine
+from .metrics import DAY_ERRORS
+from .models import PrecomputedPrediction, PredictionJob, StockPredictor, scan_day_csv
+
+SMALL_BUDGET = 4 * 1024 * 1024
+
+
+def legacy_scan_day_csv(x_test_path, company_code):
+    """改版前的寫法：每 1000 列一塊、每塊都 gc.collect()，找到後再 copy"""
+    df_iterator = pd.read_csv(x_test_path, chunksize=1000)
+    for chunk in df_iterator:
+        if int(company_code) in chunk['Company Code'].values:
+            return chunk[chunk['Company Code'] == int(company_code)].copy()
+        del chunk
+        gc.collect()
+    gc.collect()
+    return None
+
+
+def _current_rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _measure_in_child(func, args, conn):
+    # fork 出來的子 process 的 ru_maxrss 從 fork 當下的 RSS 起算，減掉起點就是這次掃描的峰值增量
+    baseline = _current_rss()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    conn.send((peak - baseline, elapsed, None if result is None else len(result)))
+    conn.close()
+
+
+def measure(func, *args):
+    """在獨立的子 process 執行 func，回傳 (峰值 RSS 增量 bytes, 秒數, 找到的列數)"""
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_in_child, args=(func, args, sender))
+    process.start()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def write_csv(path, rows, columns=15, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.normal(size=(rows, columns)), columns=[f'f{i}' for i in range(columns)])
+    frame.insert(0, 'Company Code', rng.integers(1101, 2900, rows))
+    # 要找的公司放在最後，兩種寫法都得掃完整個檔案
+    frame.loc[rows - 3:, 'Company Code'] = 9999
+    frame.to_csv(path, index=False)
+
+
+@skipUnless(os.path.exists('/proc/self/statm') and hasattr(os, 'fork'), '需要 Linux 的 /proc 與 fork')
+class ScanDayCsvRegressionTests(SimpleTestCase):
+    """沒有特徵庫時的 CSV 掃描：不再強制 gc，記憶體上限由預算決定"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmp_dir, 'X_test_raw.csv')
+        cls.large_path = os.path.join(cls.tmp_dir, 'X_test_raw_large.csv')
+        write_csv(cls.path, 20000)
+        write_csv(cls.large_path, 80000)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+        super().tearDownClass()
+
+    def test_same_rows_as_legacy(self):
+        expected = legacy_scan_day_csv(self.path, 9999)
+        actual = scan_day_csv(self.path, 9999, SMALL_BUDGET)
+        pd.testing.assert_frame_equal(actual, expected)
+        self.assertIsNone(scan_day_csv(self.path, 1, SMALL_BUDGET))
+
+    def test_faster_and_smaller_than_legacy(self):
+        legacy_peak, legacy_seconds, legacy_rows = measure(legacy_scan_day_csv, self.path, 9999)
+        peak, seconds, rows = measure(scan_day_csv, self.path, 9999, SMALL_BUDGET)
+
+        self.assertEqual(rows, legacy_rows)
+        self.assertLess(seconds, legacy_seconds / 2)
+        self.assertLessEqual(peak, legacy_peak)
+
+    def test_peak_memory_does_not_grow_with_file_size(self):
+        # 雜訊只會讓峰值偏高，各量三次取最小值
+        small_peak = min(measure(scan_day_csv, self.path, 9999, SMALL_BUDGET)[0] for _ in range(3))
+        large_peak = min(measure(scan_day_csv, self.large_path, 9999, SMALL_BUDGET)[0] for _ in range(3))
+
+        # 檔案大四倍，峰值只能多出雜訊等級的差距
+        self.assertLess(large_peak - small_peak, SMALL_BUDGET / 2)
+
+
+class StubPredictor:
+    """取代真正的 StockPredictor，只記錄即時預測的次數"""
+    snapshot = 'stub-snapshot'
+
+    def __init__(self):
+        self.calls = 0
+
+    def reload_if_changed(self):
+        return False
+
+    def predict(self, company_code):
+        self.calls += 1
+        return {'Day1': 0.5}
+
+
+class PredictionCacheQueryTests(TestCase):
+    """預測快取命中時不查資料庫，預先算好的結果只在快取沒有時讀取"""
+
+    def setUp(self):
+        prediction_cache.clear()
+        self.predictor = StubPredictor()
+        registry._predictor = self.predictor
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('predict', 'predict@example.com', 'pw'))
+
+    def tearDown(self):
+        registry.reset_predictor()
+        prediction_cache.clear()
+
+    def predict(self, company_code):
+        return self.client.post('/prediction/predict/', {'company_code': company_code}, format='json')
+
+    def test_cache_hit_does_no_queries(self):
+        PrecomputedPrediction.objects.create(
+            snapshot=StubPredictor.snapshot, company_code='2330', predictions={'Day1': 1.5}
+        )
+        with self.assertNumQueries(1):
+            first = self.predict('2330')
+        with self.assertNumQueries(0):
+            second = self.predict('02330')
+
+        self.assertEqual(first.data['predictions'], {'Day1': 1.5})
+        self.assertEqual(second.data['predictions'], {'Day1': 1.5})
+        self.assertEqual(self.predictor.calls, 0)
+
+    def test_live_prediction_cached_after_precomputed_miss(self):
+        self.predict('2317')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.predict('2317').data['predictions'], {'Day1': 0.5})
+        self.assertEqual(self.predictor.calls, 1)
+
+
+class PendingExecutor:
+    """送出的工作永遠不會完成，測試只看 PredictionJob 的建立"""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.submitted = []
+        self.shut_down = False
+
+    def submit(self, func, *args):
+        if self.broken:
+            raise BrokenProcessPool('child terminated')
+        self.submitted.append(args)
+        return Future()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class PredictionJobSubmitTests(TestCase):
+    """非同步預測工作：代碼正規化後去重，process pool 壞掉時重新建立，只有擁有者查得到"""
+
+    def setUp(self):
+        registry._predictor = StubPredictor()
+        self.executor = PendingExecutor()
+        jobs.pool.executor = self.executor
+        self.user = get_user_model().objects.create_user('jobs', 'jobs@example.com', 'pw')
+
+    def tearDown(self):
+        jobs.pool.executor = None
+        registry.reset_predictor()
+
+    def test_equivalent_codes_share_one_job(self):
+        first = jobs.submit_prediction('2330', self.user)
+        self.assertEqual(jobs.submit_prediction(' 2330', self.user).pk, first.pk)
+        self.assertEqual(jobs.submit_prediction('02330', self.user).pk, first.pk)
+
+        self.assertEqual(first.company_code, '2330')
+        self.assertEqual(PredictionJob.objects.count(), 1)
+        self.assertEqual(self.executor.submitted, [('2330',)])
+
+    def test_jobs_not_shared_between_users(self):
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'pw')
+        mine = jobs.submit_prediction('2330', self.user)
+        theirs = jobs.submit_prediction('2330', other)
+
+        self.assertNotEqual(mine.pk, theirs.pk)
+        self.assertEqual(jobs.get_job(mine.pk, self.user).pk, mine.pk)
+        self.assertIsNone(jobs.get_job(mine.pk, other))
+
+    def test_other_user_gets_404(self):
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'pw')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        job_id = client.post('/prediction/predict/jobs/', {'company_code': '2330'}, format='json').json()['job_id']
+
+        self.assertEqual(client.get(f'/prediction/predict/jobs/{job_id}/').status_code, 200)
+        client.force_authenticate(other)
+        response = client.get(f'/prediction/predict/jobs/{job_id}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('result', response.json())
+
+    def test_broken_pool_replaced_on_submit(self):
+        broken = PendingExecutor(broken=True)
+        jobs.pool.executor = broken
+        with mock.patch('aifinances.pools.ProcessPoolExecutor', return_value=self.executor):
+            job = jobs.submit_prediction('2317', self.user)
+
+        self.assertTrue(broken.shut_down)
+        self.assertIs(jobs.pool.executor, self.executor)
+        self.assertEqual(self.executor.submitted, [('2317',)])
+        self.assertEqual(job.status, PredictionJob.PENDING)
+
+    def test_broken_pool_reset_when_job_fails(self):
+        job = jobs.submit_prediction('2317', self.user)
+        future = Future()
+        future.set_exception(BrokenProcessPool('child terminated'))
+        jobs._finish(job.pk, self.executor, future)
+
+        self.assertIsNone(jobs.pool.executor)
+        self.assertTrue(self.executor.shut_down)
+        job.refresh_from_db()
+        self.assertEqual(job.status, PredictionJob.FAILED)
+
+
+def write_day_csvs(data_dir):
+    """五天的小型測試資料，沒有模型檔時用 Future_Price_Change 當預測值"""
+    for offset, day in enumerate(DAYS):
+        # 2317 在 Day3 沒有資料
+        codes = [2330, 2454] if day == 'Day3' else [2330, 2317, 2454]
+        os.makedirs(os.path.join(data_dir, day))
+        pd.DataFrame({
+            'Company Code': codes,
+            'f0': [1.0] * len(codes),
+            'Future_Price_Change': [code / 1000 + offset for code in codes],
+        }).to_csv(os.path.join(data_dir, day, 'X_test_raw.csv'), index=False)
+
+
+class PrecomputedMatchesLiveTests(TestCase):
+    """預先算好的結果和即時 predict 的格式一致：沒有資料的那一天都不列出"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.data_dir = os.path.join(cls.tmp_dir, 'data_splits')
+        write_day_csvs(cls.data_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+        super().tearDownClass()
+
+    def data_settings(self, store_dir):
+        return override_settings(
+            PREDICTION_DATA_DIR=self.data_dir,
+            PREDICTION_FEATURE_STORE_DIR=store_dir,
+            PREDICTION_MODELS_DIR=os.path.join(self.tmp_dir, 'no_models'),
+        )
+
+    def predictor(self, store_dir):
+        with self.data_settings(store_dir):
+            return StockPredictor().load()
+
+    def test_precomputed_matches_live(self):
+        store_dir = os.path.join(self.tmp_dir, 'feature_store')
+        build_store(self.data_dir, store_dir)
+        predictor = self.predictor(store_dir)
+        with self.data_settings(store_dir):
+            call_command('precompute_predictions', stdout=StringIO())
+
+        for code in ('2317', '2330'):
+            live = predictor.predict(code)
+            self.assertEqual(PrecomputedPrediction.lookup(predictor.snapshot, code), live)
+            self.assertEqual(predictor.predict_many([code])[int(code)], live)
+        self.assertNotIn('Day3', predictor.predict('2317'))
+
+    def test_batch_matches_live_without_feature_store(self):
+        predictor = self.predictor(os.path.join(self.tmp_dir, 'no_store'))
+        batch = predictor.predict_many(['2317', '2330'])
+        self.assertEqual(batch[2317], predictor.predict('2317'))
+        self.assertEqual(batch[2330], predictor.predict('2330'))
+        self.assertNotIn('Day3', batch[2317])
+
+
+class PredictorRegistryTests(SimpleTestCase):
+    """每個 process 共用一個 StockPredictor，磁碟上的資料更新後在下次檢查時重新載入"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.data_dir = os.path.join(self.tmp_dir, 'data_splits')
+        write_day_csvs(self.data_dir)
+        override = override_settings(
+            PREDICTION_DATA_DIR=self.data_dir,
+            PREDICTION_FEATURE_STORE_DIR=os.path.join(self.tmp_dir, 'no_store'),
+            PREDICTION_MODELS_DIR=os.path.join(self.tmp_dir, 'no_models'),
+            PREDICTION_RELOAD_INTERVAL=0,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        registry.reset_predictor()
+        self.addCleanup(registry.reset_predictor)
+
+    def rewrite_day1(self, change):
+        path = os.path.join(self.data_dir, 'Day1', 'X_test_raw.csv')
+        frame = pd.read_csv(path)
+        frame['Future_Price_Change'] += change
+        frame.to_csv(path, index=False)
+
+    def test_one_predictor_per_process(self):
+        with mock.patch.object(StockPredictor, 'load', autospec=True, side_effect=StockPredictor.load) as load:
+            predictors = set()
+
+            def fetch():
+                predictors.add(id(registry.get_predictor()))
+
+            threads = [threading.Thread(target=fetch) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(predictors), 1)
+        self.assertEqual(load.call_count, 1)
+
+    def test_reload_when_data_changes(self):
+        predictor = registry.get_predictor()
+        snapshot = predictor.snapshot
+        self.assertEqual(predictor.predict('2330')['Day1'], 2.33)
+        self.assertFalse(predictor.reload_if_changed())
+
+        self.rewrite_day1(10)
+        self.assertIs(registry.get_predictor(), predictor)
+        self.assertNotEqual(predictor.snapshot, snapshot)
+        self.assertAlmostEqual(predictor.predict('2330')['Day1'], 12.33)
+
+    def test_reload_disabled(self):
+        predictor = registry.get_predictor()
+        snapshot = predictor.snapshot
+        self.rewrite_day1(10)
+        with override_settings(PREDICTION_RELOAD_INTERVAL=None):
+            registry.get_predictor()
+        self.assertEqual(predictor.snapshot, snapshot)
+
+    def test_reset_predictor(self):
+        predictor = registry.get_predictor()
+        registry.reset_predictor()
+        self.assertIsNot(registry.get_predictor(), predictor)
+
+
+def fail_on_day2(score):
+    def wrapper(self, day, frame):
+        if day == 'Day2':
+            raise RuntimeError('corrupt model')
+        return score(self, day, frame)
+    return wrapper
+
+
+class PerDayIsolationTests(SimpleTestCase):
+    """五天平行處理：某一天失敗時該天為 None，其他天照常回傳；平行與依序執行結果相同"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.data_dir = os.path.join(cls.tmp_dir, 'data_splits')
+        write_day_csvs(cls.data_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+        super().tearDownClass()
+
+    def predictor(self, workers=5, executor='thread'):
+        with override_settings(
+            PREDICTION_DATA_DIR=self.data_dir,
+            PREDICTION_FEATURE_STORE_DIR=os.path.join(self.tmp_dir, 'no_store'),
+            PREDICTION_MODELS_DIR=os.path.join(self.tmp_dir, 'no_models'),
+            PREDICTION_DAY_WORKERS=workers,
+            PREDICTION_DAY_EXECUTOR=executor,
+        ):
+            predictor = StockPredictor().load()
+        self.addCleanup(self.shutdown, predictor)
+        return predictor
+
+    def shutdown(self, predictor):
+        for pool in (predictor._thread_pool, predictor._process_pool):
+            if pool is not None:
+                pool.shutdown()
+
+    def test_failing_day_does_not_affect_others(self):
+        for workers in (1, 5):
+            predictor = self.predictor(workers)
+            errors = DAY_ERRORS.value(day='Day2')
+            with mock.patch.object(StockPredictor, 'score', fail_on_day2(StockPredictor.score)), \
+                    self.assertLogs('prediction.models', 'ERROR'):
+                result = predictor.predict('2330')
+
+            self.assertEqual(result, {'Day1': 2.33, 'Day2': None, 'Day3': 4.33, 'Day4': 5.33, 'Day5': 6.33})
+            self.assertEqual(DAY_ERRORS.value(day='Day2'), errors + 1)
+            self.assertEqual(set(predictor.last_timings), set(DAYS))
+
+    def test_failing_day_in_batch(self):
+        predictor = self.predictor()
+        with mock.patch.object(StockPredictor, 'score', fail_on_day2(StockPredictor.score)), \
+                self.assertLogs('prediction.models', 'ERROR'):
+            batch = predictor.predict_many(['2330', '2317'])
+
+        self.assertIsNone(batch[2330]['Day2'])
+        self.assertIsNone(batch[2317]['Day2'])
+        self.assertEqual(batch[2330]['Day1'], 2.33)
+        # Day3 沒有 2317 的資料，不列出
+        self.assertNotIn('Day3', batch[2317])
+
+    def test_parallel_matches_sequential(self):
+        sequential = self.predictor(workers=1)
+        for predictor in (self.predictor(workers=5), self.predictor(workers=5, executor='process')):
+            for code in ('2330', '2317', '9999'):
+                self.assertEqual(predictor.predict(code), sequential.predict(code))
+            self.assertEqual(predictor.predict_many(['2330', '2317']), sequential.predict_many(['2330', '2317']))
+
+
+class DayModelOutputTests(SimpleTestCase):
+    """分類模型的每日預測值是機率最高的類別標籤，機率另外由 predict_proba 取得"""
+
+    def test_softprob_returns_class_labels(self):
+        import xgboost as xgb
+
+        rng = np.random.default_rng(0)
+        features = ['f0', 'f1']
+        frame = pd.DataFrame(rng.normal(size=(60, 2)), columns=features)
+        labels = np.digitize(frame['f0'], [-0.5, 0.5])
+        booster = xgb.train(
+            {'objective': 'multi:softprob', 'num_class': 3},
+            xgb.DMatrix(frame.to_numpy(), label=labels, feature_names=features),
+            num_boost_round=3,
+        )
+        model = DayModel('Day1', None, booster, features, 0.0, 0)
+
+        probabilities = model.predict_proba(frame)
+        values = model.predict(frame)
+        self.assertEqual(probabilities.shape, (60, 3))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1, rtol=1e-5)
+        # 每個值都是整數的類別標籤，而且就是機率最高的那一類
+        self.assertTrue(np.all(values == np.round(values)))
+        self.assertTrue(set(values.tolist()) <= {0.0, 1.0, 2.0})
+        np.testing.assert_array_equal(values, probabilities.argmax(axis=1))
+
+
+class ConvertModelsCommandTests(SimpleTestCase):
+    """convert_models：pickle 轉成 UBJSON 後預測結果不變，LFS 指標檔與缺少的模型略過"""
+
+    def setUp(self):
+        import joblib
+        import xgboost as xgb
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        rng = np.random.default_rng(0)
+        self.features = ['f0', 'f1', 'f2']
+        self.frame = pd.DataFrame(rng.normal(size=(40, 3)), columns=self.features)
+        self.frame.insert(0, 'Company Code', range(1000, 1040))
+        model = xgb.XGBRegressor(n_estimators=5, max_depth=2)
+        model.fit(self.frame[self.features], self.frame['f0'] * 2)
+
+        day_dir = os.path.join(self.tmp_dir, 'Day1')
+        os.makedirs(day_dir)
+        joblib.dump(model, os.path.join(day_dir, 'XGBoost_model.pkl'))
+        with open(os.path.join(day_dir, 'selected_features_Day1.txt'), 'w') as f:
+            f.write('\n'.join(self.features))
+
+        # Day2 只有尚未下載的 Git LFS 指標檔，Day3 沒有模型
+        os.makedirs(os.path.join(self.tmp_dir, 'Day2'))
+        with open(os.path.join(self.tmp_dir, 'Day2', 'XGBoost_model.pkl'), 'w') as f:
+            f.write('version https://git-lfs.github.com/spec/v1\noid sha256:0\nsize 1\n')
+
+    def convert(self, *args):
+        out = StringIO()
+        call_command('convert_models', '--models-dir', self.tmp_dir, '--days', 'Day1', 'Day2', 'Day3', *args, stdout=out)
+        return out.getvalue()
+
+    def booster_path(self, day):
+        return os.path.join(self.tmp_dir, day, 'XGBoost_model.ubj')
+
+    def test_converted_model_predicts_the_same(self):
+        expected = InferenceEngine(models_dir=self.tmp_dir, days=['Day1']).predict('Day1', self.frame)
+        self.assertEqual(len(expected), 40)
+        output = self.convert()
+
+        self.assertTrue(os.path.exists(self.booster_path('Day1')))
+        self.assertIn('Day1: pkl', output)
+        engine = InferenceEngine(models_dir=self.tmp_dir, days=['Day1'])
+        self.assertEqual(engine.predict('Day1', self.frame), expected)
+        self.assertEqual(engine.memory_usage()['Day1']['source'], 'ubj')
+
+    def test_skips_lfs_pointers_and_missing_models(self):
+        output = self.convert()
+
+        self.assertIn('Day2: 找不到模型檔', output)
+        self.assertIn('Day3: 找不到模型檔', output)
+        self.assertFalse(os.path.exists(self.booster_path('Day2')))
+        self.assertFalse(os.path.exists(self.booster_path('Day3')))
+
+    def test_fresh_booster_not_rewritten_without_force(self):
+        from .management.commands import convert_models
+
+        with mock.patch.object(convert_models, 'convert_model', wraps=convert_models.convert_model) as convert:
+            self.convert()
+            self.convert()
+            self.assertEqual(convert.call_count, 1)
+            self.convert('--force')
+            self.assertEqual(convert.call_count, 2)
+
+
+class SnapshotVersionTests(SimpleTestCase):
+    """資料版本號涵蓋檔案完整內容，不只大小和頭尾"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'Day1', 'X_test_raw.csv')
+        os.makedirs(os.path.dirname(self.path))
+        write_csv(self.path, 20000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def snapshot(self):
+        with override_settings(
+            PREDICTION_DATA_DIR=self.tmp_dir,
+            PREDICTION_FEATURE_STORE_DIR=os.path.join(self.tmp_dir, 'no_store'),
+            PREDICTION_MODELS_DIR=os.path.join(self.tmp_dir, 'no_models'),
+            PREDICTION_DIGEST_CACHE_PATH=os.path.join(self.tmp_dir, 'file_digests.json'),
+        ):
+            return StockPredictor().load().snapshot
+
+    def test_new_process_reuses_digest_cache(self):
+        before = self.snapshot()
+        # 模擬新啟動的 worker：process 內的快取是空的，CSV 也不能再讀
+        prediction_models._file_digest.cache_clear()
+        with mock.patch.object(prediction_models, '_file_digest', side_effect=AssertionError('CSV re-hashed')):
+            self.assertEqual(self.snapshot(), before)
+
+        with open(os.path.join(self.tmp_dir, 'file_digests.json')) as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+    def test_change_in_middle_of_file_changes_snapshot(self):
+        before = self.snapshot()
+        self.assertEqual(self.snapshot(), before)
+
+        size = os.path.getsize(self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(size // 2)
+            digit = f.read(1)
+            f.seek(size // 2)
+            f.write(b'7' if digit != b'7' else b'8')
+        self.assertEqual(os.path.getsize(self.path), size)
+
+        self.assertNotEqual(self.snapshot(), before)
+
+
+class BuildDayTextColumnTests(SimpleTestCase):
+    """文字欄位逐塊寫到暫存檔，分塊建置的結果和一次讀完相同"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_text_columns_spilled_per_chunk(self):
+        csv_path = os.path.join(self.tmp_dir, 'X_test_raw.csv')
+        frame = pd.DataFrame({
+            'Company Code': [2330, 1101, 2330, 2454, 1101, 9999, 2454],
+            'f0': [0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5],
+            # 各塊的字串長度不同，合併時寬度要取最長的
+            '產業': ['半導體', '水泥', '半導體業', 'IC設計', '水泥工業類股', '其他', 'IC'],
+        })
+        frame.to_csv(csv_path, index=False)
+
+        build_day(csv_path, os.path.join(self.tmp_dir, 'Day1'), chunksize=2)
+        table = DayTable(os.path.join(self.tmp_dir, 'Day1'))
+
+        self.assertEqual(sorted(os.listdir(table.path)), sorted(
+            ['meta.json', 'index.npz', 'col_0000.npy', 'col_0001.npy', 'col_0002.npy']
+        ))
+        for code, rows in frame.groupby('Company Code', sort=False):
+            self.assertEqual(table.rows(code)['產業'].tolist(), rows['產業'].tolist())
+            self.assertEqual(table.rows(code)['f0'].tolist(), rows['f0'].tolist())
+
+
+class ProfilingPerDayWorkTests(TestCase):
+    """被 profiling 的請求裡，每一天的讀取與預測也要出現在 profile 中"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        data_dir = os.path.join(self.tmp_dir, 'data_splits')
+        write_day_csvs(data_dir)
+        with override_settings(
+            PREDICTION_DATA_DIR=data_dir,
+            PREDICTION_FEATURE_STORE_DIR=os.path.join(self.tmp_dir, 'no_store'),
+            PREDICTION_MODELS_DIR=os.path.join(self.tmp_dir, 'no_models'),
+            PREDICTION_DAY_WORKERS=5,
+        ):
+            registry._predictor = StockPredictor().load()
+        prediction_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('profile', 'profile@example.com', 'pw'))
+
+    def tearDown(self):
+        registry.reset_predictor()
+        prediction_cache.clear()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_pool_work_appears_in_profile(self):
+        profiles = os.path.join(self.tmp_dir, 'profiles')
+        with override_settings(PROFILING_ENABLED=True, PROFILING_TOKEN='secret', PROFILING_DIR=profiles):
+            response = self.client.post(
+                '/prediction/predict/', {'company_code': '2330'}, format='json', HTTP_X_PROFILE='secret'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['predictions']), 5)
+
+        [dump] = [name for name in os.listdir(profiles) if name.endswith('.prof')]
+        functions = {name for _, _, name in pstats.Stats(os.path.join(profiles, dump)).stats}
+        self.assertIn('_day_features', functions)
+        self.assertIn('scan_day_csv', functions)
+        self.assertIn('score', functions)
+
+
+class FailingBatchPredictor(StubPredictor):
+    """包含 9999 的那一批預測失敗"""
+
+    def predict_many(self, company_codes):
+        codes = [int(code) for code in company_codes]
+        if 9999 in codes:
+            raise RuntimeError('booster failed')
+        return {code: {'Day1': code / 1000} for code in codes}
+
+
+@override_settings(PREDICTION_BATCH_CHUNK_SIZE=2)
+class BatchPredictionStreamTests(TestCase):
+    """批次預測：只接受 ASCII 數字，串流中某一批失敗時 JSON 仍然完整"""
+
+    # 每批兩家：[2330, 2317]、[9999, 2454]、[1101]
+    codes = ['2330', '2317', '9999', '2454', '1101']
+
+    def setUp(self):
+        registry._predictor = FailingBatchPredictor()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('batch', 'batch@example.com', 'pw'))
+
+    def tearDown(self):
+        registry.reset_predictor()
+
+    def batch(self, codes):
+        return self.client.post('/prediction/predict/batch/', {'company_codes': codes}, format='json')
+
+    def assert_stream_complete(self, body):
+        self.assertEqual(body['count'], 5)
+        self.assertEqual(body['predictions']['2330'], {'Day1': 2.33})
+        self.assertIsNone(body['predictions']['9999'])
+        self.assertIsNone(body['predictions']['2454'])
+        self.assertEqual(body['predictions']['1101'], {'Day1': 1.101})
+        self.assertEqual(body['errors'], [{'codes': ['9999', '2454'], 'message': 'booster failed'}])
+
+    def test_rejects_non_ascii_digits(self):
+        with override_settings(PREDICTION_BATCH_CHUNK_SIZE=50):
+            response = self.batch(['2330', '²', '２３３０'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['invalid'], ['²', '２３３０'])
+        self.assertEqual(list(response.data['predictions']), ['2330'])
+
+    def test_failed_chunk_streams_nulls_and_error(self):
+        response = self.batch(self.codes)
+        self.assertEqual(response.status_code, 200)
+        self.assert_stream_complete(json.loads(b''.join(response.streaming_content)))
+
+    def test_async_stream_failed_chunk(self):
+        from .async_views import _stream_predictions
+
+        async def collect():
+            return ''.join([text async for text in _stream_predictions(registry._predictor, self.codes, [], 2)])
+
+        self.assert_stream_complete(json.loads(asyncio.run(collect())))
@@ -1,8 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+
+# ASGI 部署時改用 async 版本的 view，兩個模組的類別名稱相同
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from . import async_views as views
+else:
+    from . import views
 
 app_name = 'prediction'
 
 urlpatterns = [
     path('predict/', views.PredictionAPI.as_view(), name='predict'),
+    path('predict/batch/', views.BatchPredictionAPI.as_view(), name='predict_batch'),
+    path('predict/jobs/', views.PredictionJobAPI.as_view(), name='predict_job_create'),
+    path('predict/jobs/<uuid:job_id>/', views.PredictionJobAPI.as_view(), name='predict_job_detail'),
 ]
\ No newline at end of file
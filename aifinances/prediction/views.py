@@ -1,15 +1,17 @@
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import StockPredictor
+from stocks.models import FavoriteStock
+from .jobs import get_job, submit_prediction
+from .models import is_company_code
+from .registry import get_predictor, predict_cached
 
 class PredictionAPI(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.predictor = StockPredictor()
 
     def post(self, request):
         try:
@@ -20,7 +22,8 @@ class PredictionAPI(APIView):
                     'message': '請提供股票代碼'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            predictions = self.predictor.predict(company_code)
+            # 快取沒有時才讀預先算好的結果，再沒有才即時計算
+            predictions = predict_cached(company_code)
             
             if predictions is None:
                 return Response({
@@ -38,4 +41,140 @@ class PredictionAPI(APIView):
             return Response({
                 'status': 'error',
                 'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class BatchPredictionAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            codes, error = parse_batch_codes(request)
+            if error is not None:
+                return error
+
+            valid = [code for code in codes if is_company_code(code)]
+            invalid = [code for code in codes if not is_company_code(code)]
+            chunk_size = getattr(settings, 'PREDICTION_BATCH_CHUNK_SIZE', 50)
+
+            if len(valid) <= chunk_size:
+                predictions = get_predictor().predict_many(valid)
+                return Response({
+                    'status': 'success',
+                    'count': len(valid),
+                    'invalid': invalid,
+                    'predictions': {code: predictions[int(code)] for code in valid}
+                }, status=status.HTTP_200_OK)
+
+            # 數量多時分批預測並逐批輸出，記憶體只保留一批的結果
+            return StreamingHttpResponse(
+                _stream_predictions(valid, invalid, chunk_size),
+                content_type='application/json'
+            )
+
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PredictionJobAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        company_code = request.data.get('company_code')
+        if not company_code:
+            return Response({
+                'status': 'error',
+                'message': '請提供股票代碼'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            job = submit_prediction(company_code, request.user)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'status': 'success',
+            'job_id': str(job.id),
+            'job_status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request, job_id):
+        job = get_job(job_id, request.user)
+        if job is None:
+            return Response({
+                'status': 'error',
+                'message': '找不到預測工作'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'status': 'success',
+            'job_id': str(job.id),
+            'job_status': job.status,
+            'company_code': job.company_code,
+            'predictions': job.result,
+            'error': job.error or None
+        }, status=status.HTTP_200_OK)
+
+
+def parse_batch_codes(request):
+    """取出批次預測的股票代碼（去重），回傳 (codes, 錯誤時的 Response)"""
+    if request.data.get('use_favorites'):
+        codes = list(
+            FavoriteStock.objects.filter(user=request.user)
+            .values_list('stock_id', flat=True)
+        )
+    else:
+        codes = request.data.get('company_codes')
+        if not isinstance(codes, list) or not codes:
+            return None, Response({
+                'status': 'error',
+                'message': '請提供股票代碼列表'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    codes = list(dict.fromkeys(str(code).strip() for code in codes))
+    max_codes = getattr(settings, 'PREDICTION_BATCH_MAX_CODES', 200)
+    if len(codes) > max_codes:
+        return None, Response({
+            'status': 'error',
+            'message': f'一次最多預測 {max_codes} 檔股票'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return codes, None
+
+
+def stream_head(codes, invalid):
+    return '{"status": "success", "count": %d, "invalid": %s, "predictions": {' % (
+        len(codes), json.dumps(invalid, ensure_ascii=False)
+    )
+
+
+def stream_chunk(chunk, predictions, first):
+    """一批的輸出；predictions 為 None（這一批失敗）時每家公司都輸出 null"""
+    items = (
+        f'{json.dumps(code)}: {json.dumps(predictions[int(code)]) if predictions is not None else "null"}'
+        for code in chunk
+    )
+    return ('' if first else ', ') + ', '.join(items)
+
+
+def stream_tail(errors):
+    return '}, "errors": %s}' % json.dumps(errors, ensure_ascii=False)
+
+
+def _stream_predictions(codes, invalid, chunk_size):
+    # 回應已經開始送出，某一批失敗時那一批輸出 null 並記在 errors，JSON 仍然完整
+    errors = []
+    yield stream_head(codes, invalid)
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        try:
+            text = stream_chunk(chunk, get_predictor().predict_many(chunk), start == 0)
+        except Exception as e:
+            errors.append({'codes': chunk, 'message': str(e)})
+            text = stream_chunk(chunk, None, start == 0)
+        yield text
+    yield stream_tail(errors)
@@ -0,0 +1,197 @@
+"""
+ASGI 模式（ASYNC_VIEWS=True）使用的 async 版本 view，回應格式與 views.py 相同。
+
+資料庫存取用 Django 的 async ORM；搜尋、隨機股票與重新下載公司快照這些會
+卡住執行緒的工作丟到 executor，不佔用 event loop。
+"""
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from aifinances.async_api import AsyncAPIView
+
+from .catalog import get_catalog, refresh_catalog
+from .models import FavoriteStock, add_favorites, get_random_stocks, remove_favorites, search_stocks
+from .pagination import FavoriteCursorPagination
+from .serializers import FavoriteStockSerializer
+from .views import bulk_response, favorite_stock_ids, parse_favorite_items
+
+
+# 純 CPU 或會下載資料的工作，不需要和 ORM 共用執行緒
+_random_stocks = sync_to_async(get_random_stocks, thread_sensitive=False)
+_search_stocks = sync_to_async(search_stocks, thread_sensitive=False)
+
+
+def _refresh_catalog():
+    refresh_catalog()
+    return len(get_catalog())
+
+
+class RandomStocksAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            try:
+                count = int(request.query_params.get('count', 5))
+                count = max(1, min(20, count))
+            except ValueError:
+                return Response({
+                    'status': 'error',
+                    'message': 'value error'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            random_stocks = await _random_stocks(count)
+            if random_stocks is None:
+                return Response({
+                    'status': 'error',
+                    'message': '無法獲取資料'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+            if not random_stocks:
+                return Response({
+                    'status': 'error',
+                    'data': '沒有可用的股票資料'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+            return Response({
+                'status': 'success',
+                'data': random_stocks
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class FavoriteStockAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        stock_id = request.data.get('stock_id')
+        stock_name = request.data.get('stock_name')
+
+        if not stock_id or not stock_name:
+            return Response({
+                'status': 'error',
+                'message': '沒有收到股票代碼或是名稱'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            favorite = await FavoriteStock.objects.acreate(
+                user=request.user,
+                stock_id=stock_id,
+                stock_name=stock_name
+            )
+            return Response({
+                'status': 'success',
+                'message': '成功加入收藏',
+                'date': FavoriteStockSerializer(favorite).data
+            }, status=status.HTTP_200_OK)
+        except IntegrityError:
+            return Response({
+                'status': 'error',
+                'message': '已經存在收藏中'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    async def delete(self, request, stock_id):
+        deleted, _ = await FavoriteStock.objects.filter(user=request.user, stock_id=stock_id).adelete()
+        if not deleted:
+            return Response({
+                'status': 'error',
+                'message': '該股票不在收藏內'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': 'success',
+            'message': '成功取消收藏'
+        })
+
+
+class BulkFavoriteStocksAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        items, error = parse_favorite_items(request)
+        if error is not None:
+            return error
+        return bulk_response(await sync_to_async(add_favorites)(request.user, items), 'added')
+
+    async def delete(self, request):
+        items, error = parse_favorite_items(request)
+        if error is not None:
+            return error
+        results = await sync_to_async(remove_favorites)(request.user, favorite_stock_ids(items))
+        return bulk_response(results, 'removed')
+
+
+class ListFavoriteStocksAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        # 和同步版本相同的 cursor 分頁，查詢在 ORM 的執行緒執行
+        paginator = FavoriteCursorPagination()
+        favorites = await sync_to_async(paginator.paginate_queryset)(
+            FavoriteStock.objects.filter(user=request.user), request, view=self
+        )
+        return paginator.get_paginated_response(FavoriteStockSerializer(favorites, many=True).data)
+
+
+class SearchStocksAPI(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            query = request.query_params.get('q', '').strip()
+
+            if not query:
+                return Response({
+                    'status': 'error',
+                    'message': '請輸入關鍵字'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if len(query) < 2:
+                return Response({
+                    'status': 'error',
+                    'message': '至少兩個字'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            results = await _search_stocks(query)
+
+            if results is None:
+                return Response({
+                    'status': 'error',
+                    'message': '搜尋過程發生錯誤'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            return Response({
+                'status': 'success',
+                'count': len(results),
+                'data': results
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class CatalogRefreshAPI(AsyncAPIView):
+    permission_classes = [IsAdminUser]
+
+    async def post(self, request):
+        try:
+            count = await sync_to_async(_refresh_catalog, thread_sensitive=False)()
+            return Response({
+                'status': 'success',
+                'message': '公司快照已更新',
+                'count': count
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
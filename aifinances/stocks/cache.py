@@ -0,0 +1,78 @@
+import sys
+import threading
+
+import pandas as pd
+
+from .catalog import catalog_version, get_catalog
+
+# 衍生資料的格式改變時調高，舊的 key 就不會再被讀到
+CATALOG_SCHEMA_VERSION = 1
+
+
+def _estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, 'memory_usage'):
+        return value.memory_usage()
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class CatalogCache:
+    """公司快照衍生資料（projection）的 process 內快取
+
+    每個 projection 只存一份，快照更新時才重建。值直接回傳同一個物件，
+    不像 LocMemCache 每次 get 都要 unpickle 複製一份，呼叫端不可修改回傳值。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._stats = {}
+        # projection 的 builder 可以再讀其他 projection
+        self._lock = threading.RLock()
+
+    def key(self, projection):
+        return f"stocks:catalog:v{CATALOG_SCHEMA_VERSION}:{projection}"
+
+    def get(self, projection, builder):
+        """取得 projection，沒有或快照已更新時用 builder(catalog) 重建"""
+        catalog = get_catalog()
+        version = catalog_version()
+        key = self.key(projection)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._record(key, hit=True)
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._record(key, hit=True)
+                return entry[1]
+
+            value = builder(catalog)
+            self._entries[key] = (version, value)
+            self._record(key, hit=False, size=_estimate_size(value))
+            return value
+
+    def _record(self, key, hit, size=None):
+        # 命中時不在 get 的鎖裡，+= 不是原子操作，不加鎖多執行緒下會掉計數
+        with self._lock:
+            stats = self._stats.setdefault(key, {'hits': 0, 'misses': 0, 'size_bytes': 0})
+            stats['hits' if hit else 'misses'] += 1
+            if size is not None:
+                stats['size_bytes'] = size
+
+    def stats(self):
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,133 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+# finlab company_basic_info 欄位 -> 快照內的欄位名稱
+CATALOG_FIELDS = {'stock_id': 'stock_id', '公司簡稱': 'name'}
+# 每隔多少秒檢查快照檔是否被其他 process 更新
+CHECK_INTERVAL = 60
+
+_lock = threading.Lock()
+_catalog = None
+_catalog_stat = None
+_last_check = 0.0
+
+
+def get_catalog_path():
+    return getattr(
+        settings,
+        'STOCKS_CATALOG_PATH',
+        os.path.join(tempfile.gettempdir(), 'aifinances', 'company_catalog.npy'),
+    )
+
+
+def _max_age():
+    return getattr(settings, 'STOCKS_CATALOG_MAX_AGE', 86400)
+
+
+def fetch_company_data():
+    """從 finlab 下載公司基本資料；有設定 STOCKS_CATALOG_FIXTURE 時改讀本地檔案"""
+    fixture = getattr(settings, 'STOCKS_CATALOG_FIXTURE', None)
+    if fixture:
+        return pd.read_csv(fixture, dtype=str)
+
+    import finlab
+    from finlab import data
+    finlab.login(settings.FINLAB_API_TOKEN)
+    return data.get('company_basic_info')
+
+
+def to_catalog_array(company_data):
+    """只保留需要的欄位，轉成定長字串的 numpy structured array"""
+    columns = {}
+    for source, field in CATALOG_FIELDS.items():
+        columns[field] = company_data[source].fillna('').astype(str).to_numpy(dtype=str)
+
+    dtype = [(field, values.dtype.str) for field, values in columns.items()]
+    catalog = np.empty(len(company_data), dtype=dtype)
+    for field, values in columns.items():
+        catalog[field] = values
+    return catalog
+
+
+def build_records(catalog):
+    """把快照轉成可以直接回傳給前端的 dict"""
+    return tuple(
+        {'stock_id': stock_id, '公司簡稱': name}
+        for stock_id, name in zip(catalog['stock_id'].tolist(), catalog['name'].tolist())
+    )
+
+
+def write_catalog(catalog, path=None):
+    """先寫暫存檔再 os.replace，其他 process 不會讀到寫一半的檔案"""
+    path = path or get_catalog_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, catalog)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def _is_fresh(path):
+    try:
+        return time.time() - os.stat(path).st_mtime < _max_age()
+    except OSError:
+        return False
+
+
+def refresh_catalog(path=None, force=True):
+    """下載並寫入快照；用檔案鎖確保同一台主機只有一個 process 在下載"""
+    global _last_check
+    path = path or get_catalog_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # 等鎖的期間可能已經被其他 worker 更新過
+            if force or not _is_fresh(path):
+                # metrics 會經由 cache 匯入本模組，這裡延後匯入
+                from .metrics import CATALOG_REFRESH_SECONDS
+                with CATALOG_REFRESH_SECONDS.time():
+                    write_catalog(to_catalog_array(fetch_company_data()), path)
+                # 這個 process 下次 get_catalog 時立刻換成新的快照
+                _last_check = 0.0
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return path
+
+
+def get_catalog():
+    """回傳唯讀 mmap 的公司快照，所有 worker 共用同一份檔案"""
+    global _catalog, _catalog_stat, _last_check
+
+    if _catalog is not None and time.monotonic() - _last_check < CHECK_INTERVAL:
+        return _catalog
+
+    with _lock:
+        path = get_catalog_path()
+        if not _is_fresh(path):
+            refresh_catalog(path, force=False)
+
+        stat = os.stat(path)
+        # 檔案被其他 process 換掉時重新 mmap
+        if _catalog is None or (stat.st_ino, stat.st_mtime_ns) != _catalog_stat:
+            _catalog = np.load(path, mmap_mode='r')
+            _catalog_stat = (stat.st_ino, stat.st_mtime_ns)
+        _last_check = time.monotonic()
+    return _catalog
+
+
+def catalog_version():
+    """目前 mmap 的快照版本（inode 與修改時間），快照換掉時會改變"""
+    return _catalog_stat
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from stocks.catalog import get_catalog_path, refresh_catalog
+
+
+class Command(BaseCommand):
+    help = '重新下載 finlab 公司基本資料並寫入共用快照檔'
+
+    def handle(self, *args, **options):
+        path = refresh_catalog(get_catalog_path())
+        self.stdout.write(self.style.SUCCESS(f"公司快照已更新: {path}"))
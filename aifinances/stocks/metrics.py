@@ -0,0 +1,30 @@
+from aifinances.metrics import Counter, Gauge, Histogram
+
+from .cache import catalog_cache
+
+CATALOG_REFRESH_SECONDS = Histogram(
+    'stocks_catalog_refresh_seconds',
+    '下載公司基本資料並寫入快照的時間',
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+SEARCH_SECONDS = Histogram('stocks_search_seconds', '搜尋股票的時間')
+
+
+def _projection_stat(name):
+    def collect():
+        return {(key.rsplit(':', 1)[-1],): stats[name] for key, stats in catalog_cache.stats().items()}
+    return collect
+
+
+CATALOG_CACHE_HITS = Counter(
+    'stocks_catalog_cache_hits_total', '公司快照衍生資料的快取命中次數', ['projection'],
+    function=_projection_stat('hits'),
+)
+CATALOG_CACHE_MISSES = Counter(
+    'stocks_catalog_cache_misses_total', '公司快照衍生資料重建的次數', ['projection'],
+    function=_projection_stat('misses'),
+)
+CATALOG_CACHE_BYTES = Gauge(
+    'stocks_catalog_cache_bytes', '公司快照衍生資料的估計大小', ['projection'],
+    function=_projection_stat('size_bytes'),
+)
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 08:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0002_alter_favoritestock_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoritestock',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='favorite_user_created_idx'),
+        ),
+    ]
@@ -1,27 +1,21 @@
-import finlab
-from finlab import data
+import logging
 import random
-from django.core.cache import cache
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-import pandas as pd
+from .cache import catalog_cache
+from .catalog import build_records
+from .metrics import SEARCH_SECONDS
+from .search_index import build_search_index
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-def get_random_stocks():
-    cache_data = cache.get('company_data')
+def get_company_records():
+    return catalog_cache.get('records', build_records)
 
-    if cache_data is None:
-        finlab.login('r0K9y4lF4EhgdSIjBVE5vY7ZKMhXqNr/N0yWFGz/keCB1a87U4N1xykyUlLu9B7S#vip_m')
-        company_data = data.get('company_basic_info')
-        cache.set('company_data', company_data, 86400)
-    else:
-        company_data = cache_data
-
-    stocks_info = company_data[['stock_id', '公司簡稱']].copy()
-    random_stocks = stocks_info.sample(n=5)
-    result = random_stocks.to_dict('records')
-    
-    return result
+def get_random_stocks(count=5):
+    records = get_company_records()
+    # 只抽索引，不建立任何 DataFrame
+    return random.sample(records, min(count, len(records)))
 
 class FavoriteStock(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name = 'favorite_stock')
@@ -32,30 +26,84 @@ class FavoriteStock(models.Model):
     class Meta:
         unique_together = ('user', 'stock_id')
         ordering = ['-created_at']
+        indexes = [
+            # 收藏清單依使用者篩選、依建立時間倒序分頁，id 是同一時間的排序依據
+            models.Index(fields=['user', '-created_at', '-id'], name='favorite_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.stock_id} ({self.stock_name})"
 
+def add_favorites(user, items):
+    """批次加入收藏：一次查出已存在的代碼，其餘用一次 bulk INSERT 寫入
+
+    items 是 [{'stock_id', 'stock_name'}, ...]，回傳與 items 同順序的
+    [{'stock_id', 'result'}]，result 為 added / exists / duplicate / invalid。
+    """
+    stock_id_length = FavoriteStock._meta.get_field('stock_id').max_length
+    stock_name_length = FavoriteStock._meta.get_field('stock_name').max_length
+
+    results, new, seen = [], {}, set()
+    for item in items:
+        stock_id = str(item.get('stock_id') or '').strip() if isinstance(item, dict) else ''
+        stock_name = str(item.get('stock_name') or '').strip() if isinstance(item, dict) else ''
+        if not stock_id or not stock_name or len(stock_id) > stock_id_length or len(stock_name) > stock_name_length:
+            result = 'invalid'
+        elif stock_id in seen:
+            result = 'duplicate'
+        else:
+            result = None
+            seen.add(stock_id)
+            new[stock_id] = stock_name
+        results.append({'stock_id': stock_id, 'result': result})
+
+    with transaction.atomic():
+        existing = set(
+            FavoriteStock.objects.filter(user=user, stock_id__in=list(new))
+            .values_list('stock_id', flat=True)
+        ) if new else set()
+        # 查詢之後才被其他請求加入的代碼由 ignore_conflicts 略過
+        FavoriteStock.objects.bulk_create([
+            FavoriteStock(user=user, stock_id=stock_id, stock_name=stock_name)
+            for stock_id, stock_name in new.items() if stock_id not in existing
+        ], ignore_conflicts=True)
+
+    for entry in results:
+        if entry['result'] is None:
+            entry['result'] = 'exists' if entry['stock_id'] in existing else 'added'
+    return results
+
+
+def remove_favorites(user, stock_ids):
+    """批次取消收藏：查出哪些在收藏內，再用一次 DELETE 刪除
+
+    回傳與 stock_ids 同順序的 [{'stock_id', 'result'}]，result 為 removed / missing / duplicate。
+    """
+    stock_ids = [str(stock_id).strip() for stock_id in stock_ids]
+    with transaction.atomic():
+        favorites = FavoriteStock.objects.filter(user=user, stock_id__in=set(stock_ids))
+        existing = set(favorites.select_for_update().values_list('stock_id', flat=True))
+        if existing:
+            # 沒有 signal 也沒有關聯的 model，Django 直接送一條 DELETE ... WHERE
+            favorites.filter(stock_id__in=existing).delete()
+
+    results, seen = [], set()
+    for stock_id in stock_ids:
+        if stock_id in seen:
+            result = 'duplicate'
+        else:
+            result = 'removed' if stock_id in existing else 'missing'
+            seen.add(stock_id)
+        results.append({'stock_id': stock_id, 'result': result})
+    return results
+
+
 def search_stocks(query):
     try:
-        cached_data = cache.get('company_data')
-        CACHE_TIMEOUT = 86400
-
-        if cached_data is None:
-            finlab.login('r0K9y4lF4EhgdSIjBVE5vY7ZKMhXqNr/N0yWFGz/keCB1a87U4N1xykyUlLu9B7S#vip_m')
-            company_data = data.get('company_basic_info')
-            stocks_info = company_data[['stock_id', '公司簡稱']].copy()
-            cache.set('company_data', stocks_info, CACHE_TIMEOUT)
-        else:
-            stocks_info = cached_data
-        
-        mask = (stocks_info['stock_id'].str.contains(query, case = False, na = False) |
-                stocks_info['公司簡稱'].str.contains(query, case = False, na = False))
-        
-        matched_stocks = stocks_info[mask].head(20)
-        return matched_stocks.to_dict('records')
+        with SEARCH_SECONDS.time():
+            return catalog_cache.get('search_index', build_search_index).search(query, limit=20)
     
-    except Exception as e:
-        print(e)
+    except Exception:
+        logger.exception("Error searching stocks for %r", query)
         return None
     
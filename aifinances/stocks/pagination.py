@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class FavoriteCursorPagination(CursorPagination):
+    """收藏清單的 keyset 分頁：依 (created_at, id) 倒序，走 favorite_user_created_idx 索引
+
+    cursor 記的是上一頁最後一筆的位置，不用 OFFSET，收藏再多每一頁的成本都一樣。
+    DRF 只拿 ordering 的第一個欄位當位置：同一個 created_at 的多筆在 cursor 裡以位移區分。
+    """
+    ordering = ('-created_at', '-id')
+    page_size = getattr(settings, 'STOCKS_FAVORITES_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'STOCKS_FAVORITES_MAX_PAGE_SIZE', 200)
@@ -0,0 +1,94 @@
+import sys
+from collections import defaultdict
+
+from .cache import catalog_cache
+from .catalog import build_records
+
+
+def _ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    """stock_id 與公司簡稱的前綴表 + 字元 n-gram 倒排索引（含中文雙字）"""
+
+    def __init__(self, records):
+        self.records = records
+        self._keys = [(record['stock_id'].lower(), record['公司簡稱'].lower()) for record in records]
+
+        # 前綴 -> 列號；stock_id 依代碼排序，名稱依原本順序
+        self._id_prefix = defaultdict(list)
+        self._name_prefix = defaultdict(list)
+        # n-gram -> 列號（遞增），單字與雙字都建
+        self._postings = defaultdict(list)
+
+        order = sorted(range(len(self._keys)), key=lambda row: self._keys[row][0])
+        for row in order:
+            stock_id = self._keys[row][0]
+            for end in range(1, len(stock_id) + 1):
+                self._id_prefix[stock_id[:end]].append(row)
+
+        for row, (stock_id, name) in enumerate(self._keys):
+            for end in range(1, len(name) + 1):
+                self._name_prefix[name[:end]].append(row)
+            grams = set()
+            for text in (stock_id, name):
+                grams |= _ngrams(text, 1) | _ngrams(text, 2)
+            for gram in grams:
+                self._postings[gram].append(row)
+
+    def __len__(self):
+        return len(self.records)
+
+    def memory_usage(self):
+        """粗估索引佔用的記憶體（bytes）"""
+        size = sys.getsizeof(self._keys) + len(self._keys) * 200
+        for table in (self._id_prefix, self._name_prefix, self._postings):
+            size += sys.getsizeof(table)
+            size += sum(sys.getsizeof(rows) for rows in table.values())
+        return size
+
+    def _substring_rows(self, query):
+        n = 2 if len(query) >= 2 else 1
+        postings = [self._postings.get(gram, ()) for gram in _ngrams(query, n)]
+        if not postings:
+            return
+        # 從最短的倒排列表依序驗證，呼叫端湊滿筆數就不再往下走
+        for row in min(postings, key=len):
+            stock_id, name = self._keys[row]
+            if query in stock_id or query in name:
+                yield row
+
+    def search(self, query, limit=20):
+        """依 代碼完全相符 > 代碼前綴 > 名稱前綴 > 任意位置包含 排序，湊滿 limit 筆就停止"""
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        seen = set()
+        results = []
+
+        def collect(rows):
+            for row in rows:
+                if row in seen:
+                    continue
+                seen.add(row)
+                results.append(self.records[row])
+                if len(results) >= limit:
+                    return True
+            return False
+
+        tiers = (
+            self._id_prefix.get(query, ()),
+            self._name_prefix.get(query, ()),
+            self._substring_rows(query),
+        )
+        for rows in tiers:
+            if collect(rows):
+                break
+        return results
+
+
+def build_search_index(catalog):
+    # 與 random-stocks 共用同一份 records，不另外複製
+    return SearchIndex(catalog_cache.get('records', build_records))
@@ -1,3 +1,352 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import catalog
+from .cache import catalog_cache
+from .models import FavoriteStock
+
+User = get_user_model()
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'company_basic_info.csv')
+
+
+def reset_catalog():
+    # 讓下一次 get_catalog 重新讀取快照檔，衍生資料也一併重建
+    catalog._catalog = None
+    catalog._catalog_stat = None
+    catalog_cache.clear()
+
+
+class CatalogFixtureMixin:
+    """公司快照寫在每個測試自己的暫存目錄，資料來自 rows（None 時用內附的 fixture）"""
+    rows = None
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+        fixture = FIXTURE
+        if self.rows is not None:
+            fixture = os.path.join(self.tmp, 'company_basic_info.csv')
+            pd.DataFrame(self.rows, columns=['stock_id', '公司簡稱']).to_csv(fixture, index=False)
+
+        override = override_settings(
+            STOCKS_CATALOG_PATH=os.path.join(self.tmp, 'company_catalog.npy'),
+            STOCKS_CATALOG_FIXTURE=fixture,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_catalog()
+        self.addCleanup(reset_catalog)
+
+
+class CatalogSnapshotTests(CatalogFixtureMixin, TestCase):
+    """公司快照：從 fixture 建立並 mmap，重新整理後換成新的快照，只有管理員能觸發"""
+
+    def write_fixture(self, rows):
+        path = os.path.join(self.tmp, 'updated.csv')
+        pd.DataFrame(rows, columns=['stock_id', '公司簡稱']).to_csv(path, index=False)
+        return path
+
+    def test_loads_fixture_into_mmap(self):
+        expected = pd.read_csv(FIXTURE, dtype=str)
+        snapshot = catalog.get_catalog()
+
+        self.assertIsInstance(snapshot, np.memmap)
+        self.assertFalse(snapshot.flags.writeable)
+        self.assertEqual(snapshot['stock_id'].tolist(), expected['stock_id'].tolist())
+        self.assertEqual(snapshot['name'].tolist(), expected['公司簡稱'].tolist())
+        self.assertTrue(os.path.exists(catalog.get_catalog_path()))
+
+    def test_management_command_refreshes_snapshot(self):
+        out = StringIO()
+        call_command('refresh_company_catalog', stdout=out)
+
+        self.assertIn(catalog.get_catalog_path(), out.getvalue())
+        self.assertEqual(len(catalog.get_catalog()), len(pd.read_csv(FIXTURE)))
+
+    def test_refresh_replaces_snapshot_and_projections(self):
+        records = catalog_cache.get('records', catalog.build_records)
+        version = catalog.catalog_version()
+
+        with override_settings(STOCKS_CATALOG_FIXTURE=self.write_fixture([('9999', '新公司')])):
+            catalog.refresh_catalog()
+        self.assertEqual(catalog.get_catalog()['stock_id'].tolist(), ['9999'])
+        self.assertNotEqual(catalog.catalog_version(), version)
+
+        updated = catalog_cache.get('records', catalog.build_records)
+        self.assertIsNot(updated, records)
+        self.assertEqual(updated, ({'stock_id': '9999', '公司簡稱': '新公司'},))
+
+    def test_refresh_endpoint_requires_admin(self):
+        client = APIClient()
+        self.assertIn(client.post('/stocks/catalog/refresh/').status_code, (401, 403))
+
+        client.force_authenticate(User.objects.create_user('member', 'member@example.com', 'password'))
+        self.assertEqual(client.post('/stocks/catalog/refresh/').status_code, 403)
+        self.assertFalse(os.path.exists(catalog.get_catalog_path()))
+
+        client.force_authenticate(User.objects.create_user('admin', 'admin@example.com', 'password', is_staff=True))
+        with override_settings(STOCKS_CATALOG_FIXTURE=self.write_fixture([('9999', '新公司'), ('9998', '新公司二')])):
+            response = client.post('/stocks/catalog/refresh/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+
+class CatalogCacheStatsTests(CatalogFixtureMixin, TestCase):
+    """命中次數在鎖內更新，多執行緒同時命中時不會掉計數"""
+
+    def test_hit_counted_under_lock(self):
+        catalog_cache.get('records', catalog.build_records)
+        worker = threading.Thread(target=catalog_cache.get, args=('records', catalog.build_records))
+
+        with catalog_cache._lock:
+            worker.start()
+            # 其他執行緒持有鎖時，命中也要等鎖才能記錄
+            worker.join(0.2)
+            self.assertTrue(worker.is_alive())
+        worker.join()
+
+        stats = catalog_cache.stats()[catalog_cache.key('records')]
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_concurrent_hits_counted(self):
+        threads, calls = 8, 500
+
+        def hit():
+            for _ in range(calls):
+                catalog_cache.get('records', catalog.build_records)
+
+        workers = [threading.Thread(target=hit) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        stats = catalog_cache.stats()[catalog_cache.key('records')]
+        self.assertEqual(stats['hits'] + stats['misses'], threads * calls)
+        self.assertEqual(stats['misses'], 1)
+
+
+class SearchStocksTests(CatalogFixtureMixin, TestCase):
+    """搜尋排序：代碼前綴 > 名稱前綴 > 任意位置包含；查詢字串不當成正規表示式"""
+    rows = [
+        ('2330', '台積電'),
+        ('2317', '鴻海'),
+        ('1234', '黑松'),
+        ('9901', '23產業'),
+        ('9902', '台23'),
+        ('9903', '台.*測試'),
+        ('1101', '台泥'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('search', 'search@example.com', 'password'))
+
+    def search(self, query):
+        return self.client.get('/stocks/search/', {'q': query})
+
+    def stock_ids(self, query):
+        response = self.search(query)
+        self.assertEqual(response.status_code, 200)
+        return [record['stock_id'] for record in response.data['data']]
+
+    def test_id_prefix_then_name_prefix_then_substring(self):
+        # 代碼前綴依代碼排序，包含的部分依快照原本的順序
+        self.assertEqual(self.stock_ids('23'), ['2317', '2330', '9901', '1234', '9902'])
+
+    def test_name_matches(self):
+        self.assertEqual(self.stock_ids('台積'), ['2330'])
+        self.assertEqual(self.stock_ids('台2'), ['9902'])
+        self.assertEqual(self.stock_ids('xyz'), [])
+
+    def test_regex_metacharacters_match_literally(self):
+        self.assertEqual(self.stock_ids('.*'), ['9903'])
+        for query in ('[(', '\\d', '(?', '**', '台|'):
+            self.assertEqual(self.stock_ids(query), [], query)
+
+    def test_rejects_short_query(self):
+        self.assertEqual(self.search('').status_code, 400)
+        self.assertEqual(self.search('2').status_code, 400)
+
+
+class RandomStocksTests(CatalogFixtureMixin, TestCase):
+    """隨機股票：回傳 count 檔不重複的公司，count 限制在 1~20"""
+    rows = [(str(1000 + i), f'公司{i}') for i in range(30)]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('random', 'random@example.com', 'password'))
+
+    def sample(self, **params):
+        return self.client.get('/stocks/random-stocks/', params)
+
+    def test_honours_count(self):
+        known = {stock_id: name for stock_id, name in self.rows}
+        for count in (1, 3, 20):
+            data = self.sample(count=count).data['data']
+            self.assertEqual(len(data), count)
+            self.assertEqual(len({record['stock_id'] for record in data}), count)
+            for record in data:
+                self.assertEqual(record['公司簡稱'], known[record['stock_id']])
+
+    def test_default_and_clamped_count(self):
+        self.assertEqual(len(self.sample().data['data']), 5)
+        self.assertEqual(len(self.sample(count=100).data['data']), 20)
+        self.assertEqual(len(self.sample(count=0).data['data']), 1)
+
+    def test_rejects_non_integer_count(self):
+        self.assertEqual(self.sample(count='abc').status_code, 400)
+
+
+class BulkFavoriteStocksTests(TestCase):
+    """批次收藏：每個項目回報結果，資料庫往返次數不隨項目數增加"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bulk', 'bulk@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, stocks):
+        return self.client.post('/stocks/favorites/bulk/', {'stocks': stocks}, format='json')
+
+    def remove(self, stocks):
+        return self.client.delete('/stocks/favorites/bulk/', {'stocks': stocks}, format='json')
+
+    def stocks(self, count, start=0):
+        return [{'stock_id': str(1000 + i), 'stock_name': f'公司{i}'} for i in range(start, start + count)]
+
+    def test_add_reports_each_item(self):
+        FavoriteStock.objects.create(user=self.user, stock_id='2330', stock_name='台積電')
+        response = self.add([
+            {'stock_id': '2330', 'stock_name': '台積電'},
+            {'stock_id': '2317', 'stock_name': '鴻海'},
+            {'stock_id': '2317', 'stock_name': '鴻海'},
+            {'stock_id': '2454'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual([entry['result'] for entry in response.data['results']],
+                         ['exists', 'added', 'duplicate', 'invalid'])
+        self.assertEqual(
+            set(FavoriteStock.objects.filter(user=self.user).values_list('stock_id', flat=True)),
+            {'2330', '2317'},
+        )
+
+    def test_remove_reports_each_item(self):
+        self.add(self.stocks(3))
+        response = self.remove(['1000', {'stock_id': '1001'}, '9999', '1000'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([entry['result'] for entry in response.data['results']],
+                         ['removed', 'removed', 'missing', 'duplicate'])
+        self.assertEqual(list(FavoriteStock.objects.values_list('stock_id', flat=True)), ['1002'])
+
+    def test_round_trips_do_not_grow_with_batch_size(self):
+        # 交易的 SAVEPOINT / RELEASE 加上查詢與寫入，各固定 4 次
+        with self.assertNumQueries(4):
+            self.add(self.stocks(1))
+        with self.assertNumQueries(4):
+            self.add(self.stocks(150, start=1))
+        with self.assertNumQueries(4):
+            self.remove([str(1000 + i) for i in range(151)])
+        self.assertFalse(FavoriteStock.objects.exists())
+
+    def test_rejects_missing_or_oversized_list(self):
+        self.assertEqual(self.add([]).status_code, 400)
+        self.assertEqual(self.client.post('/stocks/favorites/bulk/', {}, format='json').status_code, 400)
+        self.assertEqual(self.add(self.stocks(201)).status_code, 400)
+
+
+class ListFavoriteStocksTests(TestCase):
+    """收藏清單的 cursor 分頁：回傳 {next, previous, results}，依 (-created_at, -id) 排序"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cursor', 'cursor@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, count, created_at):
+        favorites = [
+            FavoriteStock.objects.create(user=self.user, stock_id=str(1000 + FavoriteStock.objects.count()), stock_name='公司')
+            for _ in range(count)
+        ]
+        # auto_now_add 不能直接指定，建立後再改成同一個時間，測試同時間以 id 排序
+        FavoriteStock.objects.filter(pk__in=[favorite.pk for favorite in favorites]).update(created_at=created_at)
+        return favorites
+
+    def walk(self, page_size):
+        pages = []
+        url = f'/stocks/favorites/?page_size={page_size}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_response_shape(self):
+        self.create(3, timezone.now())
+        response = self.client.get('/stocks/favorites/?page_size=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'next', 'previous', 'results'})
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'stock_id', 'stock_name', 'created_at'})
+
+        second = self.client.get(response.data['next']).data
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+    def test_stable_order_across_pages(self):
+        now = timezone.now()
+        older = self.create(3, now - timedelta(days=1))
+        newer = self.create(4, now)
+        # 新的在前；同一時間建立的依 id 倒序
+        expected = sorted((favorite.pk for favorite in newer), reverse=True) + \
+                   sorted((favorite.pk for favorite in older), reverse=True)
+
+        ids = [entry['id'] for page in self.walk(2) for entry in page['results']]
+        self.assertEqual(ids, expected)
+
+    def test_new_favorite_does_not_shift_later_pages(self):
+        now = timezone.now()
+        for minutes in range(4):
+            self.create(1, now - timedelta(days=1, minutes=minutes))
+        first = self.client.get('/stocks/favorites/?page_size=2').data
+        # OFFSET 分頁在這裡會重複回傳上一頁最後一筆
+        self.create(1, timezone.now())
+        second = self.client.get(first['next']).data
+
+        first_ids = [entry['id'] for entry in first['results']]
+        second_ids = [entry['id'] for entry in second['results']]
+        self.assertEqual(len(second_ids), 2)
+        self.assertFalse(set(first_ids) & set(second_ids))
+
+    def test_only_own_favorites(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        FavoriteStock.objects.create(user=other, stock_id='2330', stock_name='台積電')
+        self.create(2, timezone.now())
+
+        results = self.client.get('/stocks/favorites/').data['results']
+        self.assertEqual(len(results), 2)
+        self.assertNotIn('2330', [entry['stock_id'] for entry in results])
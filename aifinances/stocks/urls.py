@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+
+# ASGI 部署時改用 async 版本的 view，兩個模組的類別名稱相同
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from . import async_views as views
+else:
+    from . import views
 
 app_name = 'stocks'
 
@@ -8,5 +14,7 @@ urlpatterns = [
     path('favorites/', views.ListFavoriteStocksAPI.as_view(), name='list_favorites'),
     path('favorites/add/', views.FavoriteStockAPI.as_view(), name='add_favorite'),
     path('favorites/<str:stock_id>/remove/', views.FavoriteStockAPI.as_view(), name='remove_favorite'),
+    path('favorites/bulk/', views.BulkFavoriteStocksAPI.as_view(), name='bulk_favorites'),
     path('search/', views.SearchStocksAPI.as_view(), name='search_stocks'),
+    path('catalog/refresh/', views.CatalogRefreshAPI.as_view(), name='refresh_catalog'),
 ]
\ No newline at end of file
@@ -1,9 +1,12 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
-from .models import get_random_stocks, FavoriteStock, search_stocks
-from rest_framework.permissions import IsAuthenticated
+from .models import get_random_stocks, FavoriteStock, search_stocks, add_favorites, remove_favorites
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.conf import settings
 from django.db import IntegrityError
+from .catalog import get_catalog, refresh_catalog
+from .pagination import FavoriteCursorPagination
 from .serializers import FavoriteStockSerializer
 
 
@@ -22,7 +25,7 @@ class RandomStocksAPI(APIView):
                     'message': 'value error'
                 }, status = status.HTTP_400_BAD_REQUEST)
             
-            random_stocks = get_random_stocks()
+            random_stocks = get_random_stocks(count)
             if random_stocks is None:
                 return Response({
                     'status':'error',
@@ -95,9 +98,58 @@ class FavoriteStockAPI(APIView):
             }, status = status.HTTP_400_BAD_REQUEST)
 
 
+def parse_favorite_items(request):
+    """取出批次收藏的 stocks 列表，回傳 (items, 錯誤時的 Response)"""
+    items = request.data.get('stocks')
+    if not isinstance(items, list) or not items:
+        return None, Response({
+            'status': 'error',
+            'message': '請提供股票列表'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    max_items = getattr(settings, 'STOCKS_FAVORITES_BULK_MAX', 200)
+    if len(items) > max_items:
+        return None, Response({
+            'status': 'error',
+            'message': f'一次最多處理 {max_items} 檔股票'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return items, None
+
+
+def favorite_stock_ids(items):
+    # 取消收藏只需要代碼，列表元素可以是 {stock_id, stock_name} 或代碼字串
+    return [item.get('stock_id', '') if isinstance(item, dict) else item for item in items]
+
+
+def bulk_response(results, done):
+    return Response({
+        'status': 'success',
+        'count': sum(1 for entry in results if entry['result'] == done),
+        'results': results
+    }, status=status.HTTP_200_OK)
+
+
+class BulkFavoriteStocksAPI(APIView):
+    """一次加入或取消多檔收藏，不論幾檔都只有固定幾次資料庫往返"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items, error = parse_favorite_items(request)
+        if error is not None:
+            return error
+        return bulk_response(add_favorites(request.user, items), 'added')
+
+    def delete(self, request):
+        items, error = parse_favorite_items(request)
+        if error is not None:
+            return error
+        return bulk_response(remove_favorites(request.user, favorite_stock_ids(items)), 'removed')
+
+
 class ListFavoriteStocksAPI(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = FavoriteStockSerializer
+    pagination_class = FavoriteCursorPagination
 
     def get_queryset(self):
         return FavoriteStock.objects.filter(user=self.request.user)
@@ -138,4 +190,22 @@ class SearchStocksAPI(APIView):
             return Response({
                 'status':'error',
                 'message': str(e)
-            }, status = status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status = status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class CatalogRefreshAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        try:
+            refresh_catalog()
+            return Response({
+                'status': 'success',
+                'message': '公司快照已更新',
+                'count': len(get_catalog())
+            }, status = status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status = status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        # 註冊 Token 快取的失效 signal 與 /metrics 指標
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,221 @@
+"""
+帶快取的 Token 驗證：token → user 的對應先查 process 內的 LRU，再查共用快取
+（AUTH_TOKEN_SHARED_CACHE，預設是同一台主機所有 worker 共用的檔案快取，多台主機時
+改成 Redis / Memcached），都沒有才查資料庫，熱路徑上的驗證不必每次都對 Postgres
+做 Token + User 查詢。
+
+共用快取只放 token key、user_id 與 is_active，不放整個 User（密碼雜湊不會進快取）；
+從共用層讀到時組成只載入這兩個欄位的 User，其他欄位在第一次讀取時才查資料庫。
+
+Token 刪除、User 更新時由 signals.py 清掉本 process 的 LRU，並把共用快取裡該使用者
+的版本號換掉；每個 worker 的 LRU 命中時都會比對版本號，其他 worker 撤銷的 token
+在下一個請求就會失效。LocMemCache 這類 process 內的快取收不到其他 worker 的失效，
+不能當共用層，設定成這類 backend 時只用 LRU，其他 worker 最多在
+AUTH_TOKEN_CACHE_LOCAL_TTL 秒後才失效。
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+# 快取內容的格式改變時調高，舊的 key 就不會再被讀到
+TOKEN_CACHE_VERSION = 2
+
+# 每個 process 各自一份的 backend，其他 worker 看不到這裡的失效
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+_warned_aliases = set()
+
+
+def _detach(token):
+    """複製 Token 與它的 user，快取裡的物件和請求拿到的物件互不影響"""
+    user = copy.copy(token.user)
+    token = copy.copy(token)
+    token.user = user
+    return token
+
+
+def shared_cache():
+    """共用層的 cache，沒有設定或是 process 內的 backend 時回傳 None"""
+    alias = getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', None)
+    if not alias:
+        return None
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None or backend in PROCESS_LOCAL_BACKENDS:
+        if alias not in _warned_aliases:
+            _warned_aliases.add(alias)
+            logger.warning("AUTH_TOKEN_SHARED_CACHE=%r is not shared across workers, using the local LRU only", alias)
+        return None
+    return caches[alias]
+
+
+def cache_key(key):
+    # 不把 token 原文放進共用快取的 key
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"users:token:v{TOKEN_CACHE_VERSION}:{digest}"
+
+
+def user_version_key(user_id):
+    return f"users:token-user:v{TOKEN_CACHE_VERSION}:{user_id}"
+
+
+def user_version(shared, user_id):
+    """共用層裡這個使用者目前的版本號；被淘汰時是 None，和任何已記下的版本都不同"""
+    return shared.get(user_version_key(user_id))
+
+
+def bump_user_version(user_id):
+    """使用者的 token 被撤銷或資料改變，讓所有 worker 的 LRU 項目失效"""
+    shared = shared_cache()
+    if shared is not None:
+        shared.set(user_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def to_shared(token):
+    """共用層只存驗證需要的欄位，不存 User 的密碼雜湊與個資"""
+    return {'key': token.key, 'user_id': token.user_id, 'is_active': token.user.is_active}
+
+
+def from_shared(model, data):
+    """由共用層的資料組回 Token 與 User，其他欄位維持延遲載入"""
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, ['id', 'is_active'], [data['user_id'], data['is_active']])
+    token = model.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id'], [data['key'], data['user_id']])
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """token key → Token（含 user）的 process 內 LRU，項目在 ttl 秒後過期"""
+
+    def __init__(self, max_entries=4096, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, current_version=None):
+        """取出快取的 Token；current_version(user_id) 和存入時的版本不同時視為已失效"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+        # 讀共用層不佔著鎖
+        if current_version is not None and current_version(entry[1].user_id) != entry[2]:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        # 每個請求拿到自己的一份，view 修改 request.user 不會影響快取
+        return _detach(entry[1])
+
+    def set(self, key, token, version=None):
+        token = _detach(token)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key, user_id=None):
+        with self._lock:
+            self._entries.pop(key, None)
+            self.invalidations += 1
+        shared = shared_cache()
+        if shared is not None:
+            shared.delete(cache_key(key))
+        if user_id is not None:
+            bump_user_version(user_id)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = [key for key, (_, token, _) in self._entries.items() if token.user_id == user_id]
+        for key in keys:
+            self.invalidate(key)
+        bump_user_version(user_id)
+        return keys
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+
+token_cache = TokenCache(
+    max_entries=getattr(settings, 'AUTH_TOKEN_CACHE_MAX_ENTRIES', 4096),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_LOCAL_TTL', 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """和 TokenAuthentication 相同的驗證方式，token 的查詢結果放在兩層快取"""
+    token_cache = token_cache
+
+    def authenticate_credentials(self, key):
+        local = self.token_cache
+        shared = shared_cache()
+        if shared is None:
+            token = local.get(key)
+        else:
+            # LRU 命中時比對共用層的版本號，其他 worker 撤銷後這裡下一個請求就失效
+            token = local.get(key, lambda user_id: user_version(shared, user_id))
+            if token is None:
+                data = shared.get(cache_key(key))
+                if data is not None:
+                    token = from_shared(self.get_model(), data)
+                    local.shared_hits += 1
+                    local.set(key, token, user_version(shared, token.user_id))
+
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            local.misses += 1
+            version = None
+            if shared is not None:
+                version = user_version(shared, token.user_id)
+                shared.set(cache_key(key), to_shared(token), getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300))
+            local.set(key, token, version)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
@@ -0,0 +1,148 @@
+"""
+密碼雜湊服務：check_password / make_password 放到 process pool 執行。
+
+PBKDF2 一次要數百毫秒的 CPU，gunicorn gthread 每個 worker 只有兩條執行緒，
+幾個同時登入就會佔滿執行緒，其他 API 只能排隊。這裡限制每個 worker 同時進行
+的雜湊數量（USERS_HASHING_MAX_PENDING，預設執行緒數減一），超過時直接回 503 與
+Retry-After，讓至少一條執行緒留給股票與預測 API；雜湊本身在子 process 執行，
+多個 worker 的請求可以分散到不同核心。
+
+名額在子 process 真正算完（或還在排隊時被取消）才歸還，逾時的請求雖然先回 503，
+它的雜湊仍在佔用 CPU，所以不能馬上讓下一個請求進來。
+"""
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from aifinances.pools import WorkerProcessPool
+
+from .metrics import PASSWORD_HASH_QUEUE_SECONDS, PASSWORD_HASH_REJECTED, PASSWORD_HASH_SECONDS
+
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = '登入人數過多，請稍後再試'
+    default_code = 'hashing_unavailable'
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        # DRF 的 exception handler 會把 wait 轉成 Retry-After header
+        self.wait = getattr(settings, 'USERS_HASHING_RETRY_AFTER', 1)
+
+
+def _workers():
+    return getattr(settings, 'USERS_HASHING_WORKERS', 1)
+
+
+# 每個 worker process 一個 process pool，在第一次雜湊時建立
+pool = WorkerProcessPool(_workers)
+
+
+def _max_pending():
+    return getattr(settings, 'USERS_HASHING_MAX_PENDING', 1)
+
+
+def pending():
+    return _pending
+
+
+def _verify(password, encoded):
+    # 在子 process 執行；setter 被呼叫代表雜湊演算法或次數需要更新
+    started = time.time()
+    must_update = []
+    valid = hashers.check_password(password, encoded, setter=lambda raw: must_update.append(True))
+    return started, time.time() - started, (valid, bool(must_update))
+
+
+def _make(password):
+    started = time.time()
+    encoded = hashers.make_password(password)
+    return started, time.time() - started, encoded
+
+
+def _acquire(operation):
+    global _pending
+    with _pending_lock:
+        if _pending >= _max_pending():
+            PASSWORD_HASH_REJECTED.inc(operation=operation)
+            raise HashingUnavailable()
+        _pending += 1
+
+
+def _release(future=None):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _submit(executor, func, *args):
+    """送進 process pool，future 結束時（算完、失敗或被取消）才歸還名額"""
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def _run(operation, func, *args):
+    """在 process pool 執行 func，超過同時上限或逾時都丟出 HashingUnavailable"""
+    _acquire(operation)
+
+    if _workers() <= 0:
+        # 不開 process pool（開發或測試時），仍受同時上限控制
+        try:
+            submitted = time.time()
+            started, elapsed, result = func(*args)
+        finally:
+            _release()
+    else:
+        executor = pool.get()
+        submitted = time.time()
+        try:
+            future = _submit(executor, func, *args)
+            started, elapsed, result = future.result(timeout=getattr(settings, 'USERS_HASHING_TIMEOUT', 10))
+        except FutureTimeoutError:
+            # 還在排隊的會被取消並歸還名額；已經在算的要等子 process 算完
+            future.cancel()
+            PASSWORD_HASH_REJECTED.inc(operation=operation)
+            raise HashingUnavailable()
+        except BrokenProcessPool:
+            # 子 process 被 OOM killer 等原因中止，下次重新建立
+            pool.reset(executor)
+            PASSWORD_HASH_REJECTED.inc(operation=operation)
+            raise HashingUnavailable()
+
+    PASSWORD_HASH_QUEUE_SECONDS.observe(max(0.0, started - submitted), operation=operation)
+    PASSWORD_HASH_SECONDS.observe(elapsed, operation=operation)
+    return result
+
+
+def make_password(password):
+    return _run('make', _make, password)
+
+
+def set_password(user, raw_password):
+    """和 user.set_password 相同，但雜湊在 process pool 計算（呼叫端負責 save）"""
+    user.password = make_password(raw_password)
+    # 讓 save() 照常觸發 password_validation.password_changed
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    """和 user.check_password 相同，雜湊演算法需要更新時順便重新雜湊並存檔"""
+    valid, must_update = _run('check', _verify, raw_password, user.password)
+    if valid and must_update:
+        set_password(user, raw_password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,47 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+
+class Command(BaseCommand):
+    help = '既有資料庫改用 users.User：把 users.0001_initial 記為已執行，並把 content type 移到 users，需在 migrate 之前執行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        database = options['database']
+        connection = connections[database]
+        recorder = MigrationRecorder(connection)
+
+        if not recorder.has_table():
+            self.stdout.write("資料庫還沒有 migration 紀錄，交給 migrate 建立")
+            return
+
+        applied = recorder.applied_migrations()
+        if ('users', '0001_initial') in applied:
+            self.stdout.write("users.0001_initial 已經執行過，略過")
+            return
+
+        tables = connection.introspection.table_names()
+        if ('auth', '0001_initial') not in applied or 'auth_user' not in tables:
+            self.stdout.write("沒有既有的 auth_user，交給 migrate 建立")
+            return
+
+        # users.User 沿用 auth_user 與 auth_user_groups / auth_user_user_permissions，
+        # 欄位完全相同，只要補上紀錄，否則 migrate 會因 admin / authtoken / stocks
+        # 已經依賴 AUTH_USER_MODEL 而回報 InconsistentMigrationHistory
+        with transaction.atomic(using=database):
+            recorder.record_applied('users', '0001_initial')
+            if 'django_content_type' in tables:
+                self._move_content_type(database)
+
+        self.stdout.write(self.style.SUCCESS("已將 users.0001_initial 記為已執行，接著執行 migrate"))
+
+    def _move_content_type(self, database):
+        # 權限（add_user 等）掛在 content type 上，一起移過去就不必重建
+        content_types = ContentType.objects.using(database)
+        if not content_types.filter(app_label='users', model='user').exists():
+            content_types.filter(app_label='auth', model='user').update(app_label='users')
+        ContentType.objects.clear_cache()
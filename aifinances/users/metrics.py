@@ -0,0 +1,48 @@
+from aifinances.metrics import Counter, Gauge, Histogram
+
+from .authentication import token_cache
+
+
+def _token_stat(name):
+    def collect():
+        return token_cache.stats()[name]
+    return collect
+
+
+AUTH_TOKEN_CACHE_HITS = Counter(
+    'users_auth_token_cache_hits_total', 'Token 驗證在 process 內快取命中的次數',
+    function=_token_stat('hits'),
+)
+AUTH_TOKEN_CACHE_SHARED_HITS = Counter(
+    'users_auth_token_cache_shared_hits_total', 'Token 驗證在共用快取（Django cache）命中的次數',
+    function=_token_stat('shared_hits'),
+)
+AUTH_TOKEN_CACHE_MISSES = Counter(
+    'users_auth_token_cache_misses_total', 'Token 驗證需要查詢資料庫的次數',
+    function=_token_stat('misses'),
+)
+AUTH_TOKEN_CACHE_SIZE = Gauge(
+    'users_auth_token_cache_entries', 'process 內 Token 快取的項目數',
+    function=_token_stat('size'),
+)
+
+# 密碼雜湊服務（users.hashing）；operation 為 check 或 make
+PASSWORD_HASH_QUEUE_SECONDS = Histogram(
+    'users_password_hash_queue_seconds', '密碼雜湊從送出到子 process 開始執行的等待時間', ['operation'],
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    'users_password_hash_seconds', '子 process 計算一次密碼雜湊的時間', ['operation'],
+)
+PASSWORD_HASH_REJECTED = Counter(
+    'users_password_hash_rejected_total', '超過同時上限、逾時或 pool 中止而回 503 的次數', ['operation'],
+)
+
+
+def _hash_pending():
+    from .hashing import pending
+    return pending()
+
+
+PASSWORD_HASH_PENDING = Gauge(
+    'users_password_hash_pending', '目前正在等待或計算中的密碼雜湊數', function=_hash_pending,
+)
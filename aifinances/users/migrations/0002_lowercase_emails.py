@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def find_email_collisions(users):
+    """users 為 (id, username, email)，回傳轉小寫後重複的 {email: [(id, username, email), ...]}"""
+    groups = defaultdict(list)
+    for user in users:
+        groups[user[2].strip().lower()].append(user)
+    return {email: rows for email, rows in groups.items() if len(rows) > 1}
+
+
+def lowercase_emails(apps, schema_editor):
+    """email 全部轉小寫，再加上不分大小寫的唯一限制
+
+    原本登入用 email= 精確比對，大小寫不同的兩個帳號都能登入；自動清掉其中一個的
+    email 會讓那個使用者再也無法登入，所以有衝突時直接中止，列出帳號請管理員先處理。
+    """
+    User = apps.get_model('users', 'User')
+    users = User.objects.exclude(email='').order_by('id').values_list('id', 'username', 'email')
+    collisions = find_email_collisions(users.iterator())
+    if collisions:
+        rows = '\n'.join(
+            f"  {email}: " + ', '.join(f"id={pk} username={username} email={original}" for pk, username, original in group)
+            for email, group in sorted(collisions.items())
+        )
+        raise RuntimeError(
+            "以下帳號的 email 只差大小寫，無法加上不分大小寫的唯一限制。"
+            "請先合併帳號或修改其中一個的 email，再重新執行 migrate：\n" + rows
+        )
+
+    for pk, _, email in users.iterator():
+        normalized = email.strip().lower()
+        if normalized != email:
+            User.objects.filter(pk=pk).update(email=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_lowercase_emails'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower('email'),
+                condition=models.Q(('email', ''), _negated=True),
+                name='users_user_email_ci_unique',
+            ),
+        ),
+    ]
@@ -1,3 +1,43 @@
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
+from django.db.models.functions import Lower
 
-# Create your models here.
+
+class UserManager(BaseUserManager):
+    @classmethod
+    def normalize_email(cls, email):
+        # 整個 email 轉小寫（Django 預設只轉網域），存進去的值和查詢用的值一致
+        return (email or '').strip().lower()
+
+    def by_email(self, email):
+        """依 email 查詢（不分大小寫），走 users_user_email_ci_unique 索引
+
+        條件要和索引的 WHERE email <> '' 一致，資料庫才會使用這個 partial index。
+        """
+        return self.alias(email_lower=Lower('email')).filter(
+            ~models.Q(email=''), email_lower=self.normalize_email(email)
+        )
+
+
+class User(AbstractUser):
+    """沿用 auth_user 資料表的使用者，email 不分大小寫唯一且有索引
+
+    登入、註冊、重設密碼都用 email 找使用者，原本的 auth_user.email 沒有索引，
+    使用者變多後每次都是整張表掃描。
+    """
+
+    # auth_user 原本的主鍵是 int，和既有資料庫（以及外鍵欄位）一致
+    id = models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')
+
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        db_table = 'auth_user'
+        constraints = [
+            # 舊資料有些帳號沒有 email，空字串不列入唯一性檢查
+            models.UniqueConstraint(
+                Lower('email'),
+                name='users_user_email_ci_unique',
+                condition=~models.Q(email=''),
+            ),
+        ]
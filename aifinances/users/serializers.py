@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 import random
 from django.core.mail import send_mail
 from django.core.cache import cache
 from django.conf import settings
+from . import hashing
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
@@ -19,16 +21,22 @@ class RegisterSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if User.objects.by_email(value).exists():
             raise serializers.ValidationError("此電子郵件已被註冊")
-        return value
+        return User.objects.normalize_email(value)
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password']
+        # 和 create_user 相同，只是密碼雜湊交給 hashing 的 process pool
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email'])
         )
+        hashing.set_password(user, validated_data['password'])
+        try:
+            user.save()
+        except IntegrityError:
+            # 同時註冊同一個帳號或 email 時，由資料庫的唯一限制擋下
+            raise serializers.ValidationError("此帳號或電子郵件已被註冊")
         return user
 
 class LoginSerializer(serializers.Serializer):
@@ -43,11 +51,11 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("必須提供電子郵件和密碼")
             
         try:
-            # 首先通過郵箱查找用戶
-            user = User.objects.get(email=email)
+            # 首先通過郵箱查找用戶（不分大小寫，走 email 索引）
+            user = User.objects.by_email(email).get()
             
             # 檢查密碼
-            if user.check_password(password):
+            if hashing.check_password(user, password):
                 if not user.is_active:
                     raise serializers.ValidationError("用戶帳號已被禁用")
                 # 設置驗證通過的用戶
@@ -63,7 +71,7 @@ class ForgetPassword(serializers.Serializer):
     email = serializers.EmailField()
 
     def validateEmail(self, value):
-        if not User.objects.filter(email = value).exists():
+        if not User.objects.by_email(value).exists():
             raise serializers.ValidationError("此電子郵件未註冊")
         return value
 
@@ -91,17 +99,18 @@ class ResetPasswordSerializer(serializers.Serializer):
         email = data.get('email')
 
         try:
-            user = User.objects.get(email = email)
+            user = User.objects.by_email(email).get()
         except User.DoesNotExist:
             raise serializers.ValidationError('電子郵件不存在')
-        
+
+        # save() 直接用這裡查到的使用者，不再查第二次
+        data['user'] = user
         return data
     
     def save(self):
-        email = self.validated_data['email']
+        user = self.validated_data['user']
         new_password = self.validated_data['new_password']
-        user = User.objects.get(email = email)
-        user.set_password(new_password)
+        hashing.set_password(user, new_password)
         user.save()
 
         return user
@@ -118,9 +127,9 @@ class UpdateProfileSerializer(serializers.Serializer):
 
     def validate_email(self, value):
         user = self.context['request'].user
-        if User.objects.filter(email=value).exclude(id=user.id).exists():
+        if User.objects.by_email(value).exclude(id=user.id).exists():
             raise serializers.ValidationError('此電子郵件已被註冊')
-        return value
+        return User.objects.normalize_email(value)
 
     def update(self, instance, validated_data):
         if 'username' in validated_data:
@@ -136,11 +145,11 @@ class UpdatePasswordSerializer(serializers.Serializer):
 
     def validate_old_password(self, value):
         user = self.context['request'].user
-        if not user.check_password(value):
+        if not hashing.check_password(user, value):
             raise serializers.ValidationError('原密碼不正確')
         return value
 
     def update(self, instance, validated_data):
-        instance.set_password(validated_data['new_password'])
+        hashing.set_password(instance, validated_data['new_password'])
         instance.save()
         return instance
\ No newline at end of file
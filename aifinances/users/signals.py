@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # UpdatePasswordAPI 刪掉舊 token 後，舊 token 不能再從快取通過驗證
+    token_cache.invalidate(instance.key, user_id=instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # 使用者資料（is_active、email、密碼）改變時，快取裡的 user 要重新讀取
+    keys = set(token_cache.invalidate_user(instance.pk))
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        if key not in keys:
+            token_cache.invalidate(key)
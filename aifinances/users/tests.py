@@ -1,3 +1,365 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from . import hashing
+from .authentication import CachedTokenAuthentication, TokenCache, cache_key, shared_cache, token_cache
+
+User = get_user_model()
+
+
+def slow_hash(seconds):
+    # 在 process pool 執行，模擬算很久的雜湊
+    time.sleep(seconds)
+    return time.time(), seconds, True
+
+
+def hold_hash_slot(seconds):
+    # 在背景執行緒佔住雜湊名額，模擬卡在 future.result() 的請求執行緒
+    try:
+        hashing._run('check', slow_hash, seconds)
+    except hashing.HashingUnavailable:
+        pass
+
+
+class WorkerAuthentication(CachedTokenAuthentication):
+    """模擬另一個 worker：有自己的 process 內 LRU"""
+
+    def __init__(self, local_cache):
+        self.token_cache = local_cache
+
+
+class shared_file_cache(override_settings):
+    """用檔案快取當共用層，和 Redis 一樣由所有 process 共用"""
+
+    def __init__(self):
+        self.location = tempfile.mkdtemp()
+        super().__init__(
+            CACHES={**settings.CACHES, 'tokens': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.location,
+            }},
+            AUTH_TOKEN_SHARED_CACHE='tokens',
+        )
+
+    def enable(self):
+        super().enable()
+        return self.location
+
+    def disable(self):
+        super().disable()
+        shutil.rmtree(self.location, ignore_errors=True)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Token 驗證快取：熱路徑不查資料庫，token 或使用者改變時立刻失效"""
+
+    def setUp(self):
+        token_cache.clear()
+        if shared_cache() is not None:
+            shared_cache().clear()
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'old-password')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def favorites(self):
+        return self.client.get('/stocks/favorites/')
+
+    def update_profile(self, **data):
+        return self.client.put('/users/update-profile/', data, format='json')
+
+    def test_repeated_requests_skip_token_query(self):
+        self.assertEqual(self.favorites().status_code, 200)
+        # 第二次起只剩 view 自己查收藏的那一次
+        with self.assertNumQueries(1):
+            self.assertEqual(self.favorites().status_code, 200)
+        self.assertGreaterEqual(token_cache.stats()['hits'], 1)
+
+    def test_shared_cache_tier_used_when_local_entry_missing(self):
+        with shared_file_cache():
+            self.favorites()
+            token_cache.clear()
+            shared_hits = token_cache.stats()['shared_hits']
+            with self.assertNumQueries(1):
+                self.assertEqual(self.favorites().status_code, 200)
+            self.assertEqual(token_cache.stats()['shared_hits'], shared_hits + 1)
+
+    def test_process_local_backend_not_used_as_shared_tier(self):
+        caches_setting = {**settings.CACHES, 'private': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other-worker',
+        }}
+        with override_settings(CACHES=caches_setting, AUTH_TOKEN_SHARED_CACHE='private'):
+            self.assertIsNone(shared_cache())
+
+    def test_revoked_token_expires_in_other_worker_within_local_ttl(self):
+        # 另一個 worker：自己的 LRU，以及自己那份 LocMemCache（裡面還留著這個 token）
+        other_worker = WorkerAuthentication(TokenCache(ttl=0.2))
+        caches_setting = {**settings.CACHES, 'private': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other-worker',
+        }}
+        with override_settings(CACHES=caches_setting, AUTH_TOKEN_SHARED_CACHE='private'):
+            from django.core.cache import caches
+            key = self.token.key
+            other_worker.authenticate_credentials(key)
+            caches['private'].set(cache_key(key), self.token)
+
+            # 本 worker 撤銷 token，signal 只清得到本 process；另一個 worker 在 LRU 過期前仍會通過
+            self.token.delete()
+            other_worker.authenticate_credentials(key)
+
+            time.sleep(0.25)
+            with self.assertRaises(AuthenticationFailed):
+                other_worker.authenticate_credentials(key)
+
+    def test_password_update_revokes_token_in_other_worker_immediately(self):
+        # 另一個 worker 的 LRU TTL 很長，只能靠共用層的版本號得知撤銷
+        other_worker = WorkerAuthentication(TokenCache(ttl=600))
+        with shared_file_cache():
+            key = self.token.key
+            other_worker.authenticate_credentials(key)
+            other_worker.authenticate_credentials(key)
+            self.assertEqual(other_worker.token_cache.stats()['hits'], 1)
+
+            response = self.client.put('/users/update-password/', {
+                'old_password': 'old-password', 'new_password': 'new-password',
+            }, format='json')
+            self.assertEqual(response.status_code, 200)
+
+            with self.assertRaises(AuthenticationFailed):
+                other_worker.authenticate_credentials(key)
+            user, _ = other_worker.authenticate_credentials(response.data['newToken'])
+            self.assertEqual(user.pk, self.user.pk)
+
+    def test_shared_tier_stores_no_user_data(self):
+        with shared_file_cache() as location:
+            self.favorites()
+            from django.core.cache import caches
+            self.assertEqual(caches['tokens'].get(cache_key(self.token.key)), {
+                'key': self.token.key, 'user_id': self.user.pk, 'is_active': True,
+            })
+            for root, _, files in os.walk(location):
+                for name in files:
+                    with open(os.path.join(root, name), 'rb') as f:
+                        content = f.read()
+                    self.assertNotIn(self.user.password.encode(), content)
+                    self.assertNotIn(b'cached@example.com', content)
+
+    def test_shared_hit_loads_other_user_fields_lazily(self):
+        with shared_file_cache():
+            self.favorites()
+            token_cache.clear()
+            with self.assertNumQueries(0):
+                user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+            self.assertEqual(user.pk, self.user.pk)
+            with self.assertNumQueries(1):
+                self.assertEqual(user.username, 'cached')
+
+    def test_password_update_revokes_cached_token(self):
+        self.favorites()
+        response = self.client.put('/users/update-password/', {
+            'old_password': 'old-password',
+            'new_password': 'new-password',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.favorites().status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['newToken']}")
+        self.assertEqual(self.favorites().status_code, 200)
+
+    def test_deactivated_user_rejected(self):
+        self.favorites()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.favorites().status_code, 401)
+
+    def test_profile_update_refreshes_cached_user(self):
+        self.favorites()
+        response = self.update_profile(username='renamed')
+        self.assertEqual(response.data['user']['username'], 'renamed')
+        # 使用者存檔後快取已失效，下一次驗證重新讀到新名稱
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.favorites()
+        self.assertEqual(token_cache.get(self.token.key).user.username, 'renamed')
+
+    def test_cached_user_is_copied_per_request(self):
+        self.favorites()
+        first = token_cache.get(self.token.key)
+        first.user.username = 'mutated'
+        self.assertEqual(token_cache.get(self.token.key).user.username, 'cached')
+
+
+class EmailLookupTests(TestCase):
+    """email 不分大小寫唯一，登入 / 註冊 / 重設密碼各只查一次使用者"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('mail', 'Mail.User@Example.com', 'password-1234')
+        Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def test_email_stored_lowercase_and_found_in_any_case(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'mail.user@example.com')
+        self.assertEqual(User.objects.by_email(' MAIL.user@example.COM ').get(), self.user)
+
+    def test_login_is_case_insensitive_with_one_lookup(self):
+        with self.assertNumQueries(2):
+            # 查使用者一次，另一次是 Token 的 get_or_create
+            response = self.client.post('/users/login/', {
+                'email': 'MAIL.USER@example.com', 'password': 'password-1234',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_register_rejects_email_differing_only_in_case(self):
+        response = self.client.post('/users/register/', {
+            'username': 'other', 'email': 'mail.user@EXAMPLE.com', 'password': 'password-5678',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+
+    def test_database_enforces_case_insensitive_uniqueness(self):
+        from django.db import IntegrityError, transaction
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(username='raw', email='MAIL.USER@EXAMPLE.COM')
+        # 沒有 email 的帳號不受唯一限制
+        User.objects.create(username='blank1', email='')
+        User.objects.create(username='blank2', email='')
+
+    def test_reset_password_looks_up_user_once(self):
+        # SELECT 使用者一次 + UPDATE 一次，再加上清除 Token 快取時查該使用者的 token
+        with self.assertNumQueries(3):
+            response = self.client.post('/users/ResetPassword/', {
+                'email': 'mail.user@example.com', 'new_password': 'password-9999',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('password-9999'))
+
+
+class LowercaseEmailMigrationTests(SimpleTestCase):
+    """email 轉小寫的 migration：只差大小寫的帳號要列出來，不能清掉其中一個的 email"""
+
+    def setUp(self):
+        from importlib import import_module
+
+        self.migration = import_module('users.migrations.0002_lowercase_emails')
+
+    def test_collisions_listed_with_every_account(self):
+        collisions = self.migration.find_email_collisions([
+            (1, 'amy', 'Amy@Example.com'),
+            (2, 'bob', 'bob@example.com'),
+            (3, 'amy2', 'amy@example.com '),
+        ])
+        self.assertEqual(collisions, {
+            'amy@example.com': [(1, 'amy', 'Amy@Example.com'), (3, 'amy2', 'amy@example.com ')],
+        })
+
+    def test_migration_aborts_instead_of_erasing_email(self):
+        rows = [(1, 'amy', 'Amy@Example.com'), (3, 'amy2', 'amy@example.com')]
+        queryset = mock.MagicMock()
+        queryset.exclude.return_value.order_by.return_value.values_list.return_value.iterator.return_value = iter(rows)
+        apps = mock.Mock(get_model=mock.Mock(return_value=mock.Mock(objects=queryset)))
+
+        with self.assertRaisesMessage(RuntimeError, 'id=3 username=amy2'):
+            self.migration.lowercase_emails(apps, None)
+        queryset.filter.assert_not_called()
+
+
+class PasswordHashingTests(TestCase):
+    """密碼雜湊在 process pool 執行，超過同時上限時回 503"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('hash', 'hash@example.com', 'password-1234')
+        Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def login(self, password='password-1234'):
+        return self.client.post('/users/login/', {'email': 'hash@example.com', 'password': password}, format='json')
+
+    def test_login_and_register_hash_in_pool(self):
+        from .metrics import PASSWORD_HASH_QUEUE_SECONDS, PASSWORD_HASH_SECONDS
+
+        checks = PASSWORD_HASH_SECONDS.value(operation='check')['count']
+        makes = PASSWORD_HASH_QUEUE_SECONDS.value(operation='make')['count']
+
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login('wrong-password').status_code, 400)
+        response = self.client.post('/users/register/', {
+            'username': 'hash2', 'email': 'hash2@example.com', 'password': 'password-5678',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.get(username='hash2').check_password('password-5678'))
+
+        self.assertEqual(PASSWORD_HASH_SECONDS.value(operation='check')['count'], checks + 2)
+        self.assertEqual(PASSWORD_HASH_QUEUE_SECONDS.value(operation='make')['count'], makes + 1)
+
+    def test_rejects_when_pending_limit_reached(self):
+        from .metrics import PASSWORD_HASH_REJECTED
+
+        rejected = PASSWORD_HASH_REJECTED.value(operation='check')
+        with mock.patch.object(hashing, '_pending', hashing._max_pending()):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(PASSWORD_HASH_REJECTED.value(operation='check'), rejected + 1)
+        # 計數有歸還，下一個請求照常處理
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_request_thread_stays_free_while_logins_saturated(self):
+        import threading
+
+        # 預設上限比 gthread 執行緒數少一，至少一條執行緒不會卡在等雜湊
+        self.assertLess(settings.USERS_HASHING_MAX_PENDING, settings.GUNICORN_THREADS)
+
+        with override_settings(USERS_HASHING_WORKERS=1, USERS_HASHING_MAX_PENDING=settings.GUNICORN_THREADS - 1):
+            holders = [
+                threading.Thread(target=hold_hash_slot, args=(1.0,))
+                for _ in range(settings.GUNICORN_THREADS - 1)
+            ]
+            for holder in holders:
+                holder.start()
+            deadline = time.monotonic() + 5
+            while hashing.pending() < len(holders) and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            # 其餘的執行緒：登入馬上回 503，其他 API 照常回應
+            started = time.monotonic()
+            self.assertEqual(self.login().status_code, 503)
+            self.assertLess(time.monotonic() - started, 0.5)
+            self.client.force_authenticate(self.user)
+            self.assertEqual(self.client.get('/stocks/favorites/').status_code, 200)
+
+            for holder in holders:
+                holder.join()
+
+    def test_timed_out_hash_keeps_slot_until_child_finishes(self):
+        with override_settings(USERS_HASHING_WORKERS=1, USERS_HASHING_TIMEOUT=0.1):
+            with self.assertRaises(hashing.HashingUnavailable):
+                hashing._run('check', slow_hash, 1.0)
+            # 請求已經放棄，但子 process 還在算，名額還沒歸還
+            self.assertEqual(hashing.pending(), 1)
+
+            deadline = time.monotonic() + 5
+            while hashing.pending() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(hashing.pending(), 0)
+
+    def test_outdated_hash_upgraded_on_login(self):
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+        hasher = PBKDF2PasswordHasher()
+        outdated = hasher.encode('password-1234', hasher.salt(), iterations=1000)
+        User.objects.filter(pk=self.user.pk).update(password=outdated)
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(hasher.decode(self.user.password)['iterations'], hasher.iterations)
@@ -1,15 +1,30 @@
 # gunicorn.conf.py
+import os
+
+# 部署模式：預設 WSGI + gthread；GUNICORN_MODE=asgi 時改用 uvicorn worker 跑 ASGI，
+# 連線數不再受限於執行緒數（啟動指令改成 gunicorn -c gunicorn.conf.py aifinances.asgi:application）
+MODE = os.environ.get('GUNICORN_MODE', 'wsgi')
 
 # Worker 設定
-workers = 1  # 減少 worker 數量
-threads = 2  # 使用執行緒來處理請求
-worker_class = 'gthread'  # 使用執行緒模式
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))  # 減少 worker 數量
 worker_connections = 1000
+if MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'aifinances.asgi:application'
+    # stocks 與 prediction 改用 async view，預測等阻塞工作丟到 executor
+    os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'True')
+else:
+    threads = int(os.environ.get('GUNICORN_THREADS', 2))  # 使用執行緒來處理請求（settings 的雜湊上限也依此計算）
+    worker_class = 'gthread'  # 使用執行緒模式
 
 # 超時設定
 timeout = 120  # 增加超時時間
 graceful_timeout = 30
 
+# 預先載入：master 載入 app 並暖機後才 fork，worker 回收重啟時不必重新載入資料。
+# 預設關閉；master 也會常駐一份資料與模型，開啟前先量過 RSS 確認機器容得下
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'False') == 'True'
+
 # 記憶體相關
 max_requests = 1000        # 處理這麼多請求後重啟 worker
 max_requests_jitter = 200  # 添加隨機性以避免同時重啟
@@ -23,4 +38,20 @@ loglevel = 'info'
 # 限制記憶體使用
 limit_request_line = 4096
 limit_request_fields = 100
-limit_request_field_size = 8190
\ No newline at end of file
+limit_request_field_size = 8190
+
+
+def when_ready(server):
+    # preload_app 時 app 已經在 master 載入，這裡在第一次 fork 之前暖機
+    if not preload_app:
+        return
+    from aifinances.warmup import warm_up
+    timings = warm_up()
+    server.log.info("Warmup finished: %s", timings)
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from aifinances.warmup import after_fork
+    after_fork()